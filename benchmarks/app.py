@@ -0,0 +1,133 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Boots main.py for benchmarking: Mongo is replaced by mongomock unless
+# BENCH_MONGO_URI points at a real server, and the Google OAuth round trips
+# are answered locally. Everything else is the production code path.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# === Load environment variables ===
+BENCH_MONGO_URI = os.getenv("BENCH_MONGO_URI")
+BENCH_COMPANIES = int(os.getenv("BENCH_COMPANIES", "2000"))
+BENCH_OAUTH_LATENCY_MS = float(os.getenv("BENCH_OAUTH_LATENCY_MS", "0"))
+PORT = int(os.getenv("PORT", "8090"))
+
+STATES = ["SP", "RJ", "MG", "RS", "PR", "BA", "SC", "PE", "CE", "GO"]
+CITIES = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Porto Alegre", "Curitiba",
+          "Salvador", "Florianópolis", "Recife", "Fortaleza", "Goiânia"]
+WORDS = ["Alfa", "Beta", "Gama", "Delta", "Norte", "Sul", "Tech", "Log", "Agro", "Saúde",
+         "Serviços", "Comércio", "Indústria", "Consultoria", "Digital"]
+
+
+def fake_cnpj(rng):
+    from utils.validation import cnpj_check_digits, format_cnpj
+    base = "".join(str(rng.randrange(10)) for _ in range(12))
+    return format_cnpj(base + cnpj_check_digits(base))
+
+
+def fake_company(rng, i):
+    state = rng.randrange(len(STATES))
+    return {
+        "company_name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+        "company_CNPJ": fake_cnpj(rng),
+        "company_address_CEP": f"{rng.randrange(100000):05d}-{rng.randrange(1000):03d}",
+        "company_address_number": str(rng.randrange(1, 3000)),
+        "company_address_additional": "",
+        "company_address_city": CITIES[state],
+        "company_address_state": STATES[state],
+    }
+
+
+def configure_environment():
+    os.environ.setdefault("APP_STORAGE_SECRET", "bench-secret")
+    os.environ.setdefault("GOOGLE_CLIENT_ID", "bench")
+    os.environ.setdefault("GOOGLE_CLIENT_SECRET", "bench")
+    os.environ.setdefault("BASE_URL", f"http://127.0.0.1:{PORT}")
+    os.environ.setdefault("COMPANY_CHANGE_STREAM", "0")
+    os.environ.setdefault("REPORT_RENDER_WARMUP", "0")
+    os.environ.setdefault("SLOW_REQUEST_MS", "1000000")
+    # Generated addresses are random, so CEP cross-checks stay off.
+    os.environ.setdefault("CEP_INDEX_PATH", "")
+    # Never touch the real provider: the login stub below does not need it.
+    bundle = {
+        "metadata": {
+            "issuer": "https://accounts.google.com",
+            "authorization_endpoint": "http://127.0.0.1/authorize",
+            "token_endpoint": "http://127.0.0.1/token",
+            "jwks_uri": "http://127.0.0.1/jwks",
+        },
+        "jwks": {"keys": []},
+    }
+    path = os.path.join(tempfile.mkdtemp(prefix="ats-bench-"), "oauth.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(bundle, f)
+    os.environ.setdefault("OAUTH_METADATA_FILE", path)
+    if BENCH_MONGO_URI:
+        os.environ["MONGO_URI"] = BENCH_MONGO_URI
+    else:
+        install_mongomock()
+
+
+def install_mongomock():
+    import mongomock
+    import pymongo
+    os.environ["MONGO_URI"] = "mongodb://mongomock"
+    shared = mongomock.MongoClient()
+    # Pool and listener options mean nothing to mongomock; every caller gets
+    # the same in-memory server.
+    pymongo.MongoClient = lambda *args, **kwargs: shared
+
+
+def seed_companies():
+    from utils.db import get_companies_collection
+    from utils.search import search_fields
+    collection = get_companies_collection()
+    if collection.estimated_document_count() >= BENCH_COMPANIES:
+        return
+    rng = random.Random(42)
+    docs = []
+    for i in range(BENCH_COMPANIES):
+        company = fake_company(rng, i)
+        company.update(search_fields(company), version=0)
+        docs.append(company)
+    collection.insert_many(docs)
+    print(f"[BENCH] Seeded {len(docs)} companies")
+
+
+def stub_oauth(oauth):
+    from fastapi.responses import RedirectResponse
+    import asyncio
+
+    async def authorize_redirect(request, redirect_uri):
+        user = request.query_params.get("bench_user", "bench")
+        return RedirectResponse(f"{redirect_uri}?bench_user={user}")
+
+    async def authorize_access_token(request):
+        # Stands in for the token exchange and id_token verification.
+        if BENCH_OAUTH_LATENCY_MS:
+            await asyncio.sleep(BENCH_OAUTH_LATENCY_MS / 1000)
+        user = request.query_params.get("bench_user", "bench")
+        return {"userinfo": {"email": f"{user}@bench.local", "name": f"Bench {user}", "picture": ""}}
+
+    oauth.google.authorize_redirect = authorize_redirect
+    oauth.google.authorize_access_token = authorize_access_token
+
+
+# Report render workers are spawned and re-import __main__ as __mp_main__;
+# only the parent process may boot the app.
+if __name__ == "__main__":
+    configure_environment()
+    started = time.perf_counter()
+    import main
+    from nicegui import ui
+    from utils.auth import get_oauth
+    print(f"[BENCH] Imported main in {time.perf_counter() - started:.2f}s")
+    seed_companies()
+    stub_oauth(get_oauth())
+    ui.run(host="127.0.0.1", port=PORT, reload=False, show=False)
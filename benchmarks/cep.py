@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# CEP lookup latency against a synthetic index of --ranges ranges:
+#
+#   python benchmarks/cep.py --ranges 1000000
+#
+# Times uncached lookups (binary search over the mapped file), cached
+# lookups (LRU hit) and batch lookups as used by bulk import.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cep import CepService, build_index
+
+
+def write_source(path, ranges, places=5000):
+    # Evenly spaced ranges over the whole CEP space, cities drawn from a fixed pool.
+    step = 100_000_000 // ranges
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("cep_inicial;cep_final;localidade;uf\n")
+        for i in range(ranges):
+            start = i * step
+            f.write(f"{start:08d};{start + step - 1:08d};Cidade {i % places};SP\n")
+
+
+def timed(label, fn, count):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"[BENCH] {label:<20} {elapsed / count * 1e6:8.2f} us/lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CEP index lookup micro-benchmark.")
+    parser.add_argument("--ranges", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="cep-bench-")
+    source, index = os.path.join(directory, "source.csv"), os.path.join(directory, "index.bin")
+    write_source(source, args.ranges)
+    started = time.perf_counter()
+    build_index(source, index)
+    print(f"[BENCH] Built {args.ranges} ranges in {time.perf_counter() - started:.1f}s "
+          f"({os.path.getsize(index) / 2 ** 20:.1f} MiB)")
+
+    service = CepService(index, cache_size=args.lookups)
+    rng = random.Random(3)
+    ceps = [f"{n // 1000:05d}-{n % 1000:03d}" for n in (rng.randrange(100_000_000) for _ in range(args.lookups))]
+    numbers = [int(cep.replace("-", "")) for cep in ceps]
+    timed("index (uncached)", lambda: [service.index.lookup_number(n) for n in numbers], args.lookups)
+    timed("lookup (cold cache)", lambda: [service.lookup(cep) for cep in ceps], args.lookups)
+    timed("lookup (warm cache)", lambda: [service.lookup(cep) for cep in ceps], args.lookups)
+    timed("lookup_many (batch)", lambda: service.lookup_many(ceps), args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Import-time budget for main.py. Worker starts (and the NiceGUI reloader,
+# which imports main twice) pay this before the port is bound, so it is
+# tracked against a budget:
+#
+#   python benchmarks/import_time.py --budget 2000
+#
+# Exits 1 when the best of --runs imports exceeds the budget, or when
+# importing main opens a Mongo connection.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# === Load environment variables ===
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2000"))
+
+MEASURE = """
+import time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+import utils.db
+print(f"{elapsed * 1000:.1f} {int(utils.db._client is not None)}")
+"""
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def app_env():
+    # Any URI will do: importing main must not connect.
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100")
+    env.setdefault("APP_STORAGE_SECRET", "import-time")
+    env["PYTHONPATH"] = ROOT
+    return env
+
+
+def measure_once():
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE], cwd=ROOT, env=app_env(),
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[-2]), output[-1] == "1"
+
+
+def slowest_imports(limit):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=app_env(),
+        capture_output=True, text=True,
+    ).stderr
+    top_level = []
+    for self_us, cumulative_us, indent, name in _LINE.findall(stderr):
+        # Only packages imported directly by our code or the interpreter top level.
+        if len(indent) <= 3:
+            top_level.append((int(cumulative_us), name))
+    return sorted(top_level, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check main.py's import time against a budget.")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS, help="milliseconds")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="list the N slowest imports")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    best = min(ms for ms, _ in runs)
+    connected = any(c for _, c in runs)
+    print(f"[IMPORT] import main: best {best:.0f}ms of {args.runs} (budget {args.budget:.0f}ms)")
+    for cumulative_us, name in slowest_imports(args.top):
+        print(f"[IMPORT]   {cumulative_us / 1000:8.1f}ms  {name}")
+    failed = False
+    if connected:
+        print("[IMPORT] FAIL: importing main created a Mongo client")
+        failed = True
+    if best > args.budget:
+        print(f"[IMPORT] FAIL: over budget by {best - args.budget:.0f}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import re
+import uuid
+import socketio
+
+# Minimal headless NiceGUI client: reads the element tree from a page's HTML,
+# opens the page's websocket and fires the same events the browser would,
+# so the page's server-side callbacks run exactly as in production.
+# Written against NiceGUI 2.x's wire protocol.
+
+_CLIENT_ID = re.compile(r"""client_?[iI]d["']?\s*[:=]\s*["']([0-9a-f-]{8,})["']""")
+_ELEMENTS = re.compile(r"""elements["']?\s*[:=]\s*""")
+
+
+class PageError(Exception):
+    pass
+
+
+def parse_page(html):
+    client_id = _CLIENT_ID.search(html)
+    if not client_id:
+        raise PageError("client id not found in page")
+    decoder = json.JSONDecoder()
+    for match in _ELEMENTS.finditer(html):
+        start = html.find("{", match.end(), match.end() + 2)
+        if start < 0:
+            continue
+        try:
+            elements, _ = decoder.raw_decode(html, start)
+        except ValueError:
+            continue
+        if isinstance(elements, dict) and elements:
+            return client_id.group(1), {str(k): v for k, v in elements.items()}
+    raise PageError("element tree not found in page")
+
+
+class PageSession:
+    def __init__(self, base_url, html, cookies=None):
+        self.base_url = base_url
+        self.client_id, self.elements = parse_page(html)
+        self.cookies = cookies or {}
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self._activity = asyncio.Event()
+        self.notifications = []
+        self.sio.on("*", self._on_message)
+
+    async def connect(self):
+        headers = {"Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items())} if self.cookies else {}
+        await self.sio.connect(
+            f"{self.base_url}?client_id={self.client_id}",
+            socketio_path="/_nicegui_ws/socket.io",
+            headers=headers,
+            transports=["websocket"],
+        )
+        await self.sio.call("handshake", {
+            "client_id": self.client_id,
+            "tab_id": uuid.uuid4().hex,
+            "old_tab_id": None,
+        }, timeout=10)
+
+    async def close(self):
+        await self.sio.disconnect()
+
+    async def _on_message(self, event, data=None):
+        # Newer releases wrap every message as [type, payload]; older ones
+        # emit the type as the socket.io event name.
+        if event == "message" and isinstance(data, (list, tuple)):
+            event, data = next((x for x in data if isinstance(x, str)), event), data[-1]
+        if event == "update" and isinstance(data, dict):
+            for element_id, element in data.items():
+                if element is None:
+                    self.elements.pop(str(element_id), None)
+                else:
+                    self.elements[str(element_id)] = element
+        elif event == "notify":
+            self.notifications.append(data)
+        self._activity.set()
+
+    def find(self, predicate):
+        for element_id, element in self.elements.items():
+            if predicate(element):
+                return element_id
+        raise PageError("element not found")
+
+    def by_text(self, text):
+        return self.find(lambda e: e.get("text") == text or e.get("props", {}).get("label") == text)
+
+    def by_placeholder(self, placeholder):
+        return self.find(lambda e: e.get("props", {}).get("placeholder") == placeholder)
+
+    def listener(self, element_id, event_type):
+        for listener in self.elements[element_id].get("events", []):
+            if listener.get("type") == event_type:
+                return listener["listener_id"]
+        raise PageError(f"no {event_type} listener on element {element_id}")
+
+    async def emit(self, element_id, event_type, *args, wait=True, timeout=10):
+        self._activity.clear()
+        await self.sio.emit("event", {
+            "id": int(element_id),
+            "client_id": self.client_id,
+            "listener_id": self.listener(element_id, event_type),
+            "args": [json.dumps(arg) for arg in args],
+        })
+        if wait:
+            # Any message back means the callback ran and its UI changes arrived.
+            await asyncio.wait_for(self._activity.wait(), timeout)
+
+    async def set_value(self, element_id, value):
+        await self.emit(element_id, "update:modelValue", value, wait=False)
+
+    async def click(self, element_id, **kwargs):
+        await self.emit(element_id, "click", **kwargs)
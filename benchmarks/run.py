@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+import psutil
+
+# Load harness: boots benchmarks/app.py (main.py on mongomock with stubbed
+# OAuth), drives each scenario with concurrent virtual users and reports
+# latency percentiles, throughput and server memory. Results can be saved as
+# a baseline and later runs compared against it.
+#
+#   python benchmarks/run.py --save
+#   python benchmarks/run.py --compare
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(HERE, "baselines")
+SCENARIOS = ("navigation", "login", "settings_crud")
+
+
+# === Measurements ===
+
+class Recorder:
+    def __init__(self):
+        self.samples = []
+        self.errors = 0
+
+    async def time(self, coro):
+        # Failed operations raise and are counted as errors by the caller.
+        started = time.perf_counter()
+        result = await coro
+        self.samples.append(time.perf_counter() - started)
+        return result
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class MemorySampler:
+    def __init__(self, pid, interval=0.2):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.start_rss = self.process.memory_info().rss
+        self.peak_rss = self.start_rss
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self.end_rss = self.process.memory_info().rss
+
+
+# === Scenarios ===
+
+async def login(client, user):
+    # Stubbed provider: /login redirects straight to /redirect, which
+    # upserts the user and sets the session cookie.
+    response = await client.get("/oauth/google/login", params={"bench_user": user})
+    response = await client.get(response.headers["location"])
+    if response.status_code not in (302, 303, 307) or "ats_jwt_token" not in response.cookies:
+        raise RuntimeError(f"login failed with {response.status_code}")
+
+
+async def navigation_user(base_url, user, recorder, deadline):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        await login(client, user)
+        while time.perf_counter() < deadline:
+            for path in ("/", "/dashboard", "/settings"):
+                try:
+                    response = await recorder.time(client.get(path))
+                    response.raise_for_status()
+                except Exception:
+                    recorder.errors += 1
+
+
+async def login_user(base_url, user, recorder, deadline):
+    n = 0
+    while time.perf_counter() < deadline:
+        # A fresh client per login: no cookies carried over.
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            try:
+                await recorder.time(login(client, f"{user}-{n}"))
+            except Exception:
+                recorder.errors += 1
+        n += 1
+
+
+def form_cnpj(rng):
+    # Valid check digits, so submissions are not rejected by the form.
+    from utils.validation import cnpj_check_digits, format_cnpj
+    base = "".join(str(rng.randrange(10)) for _ in range(12))
+    return format_cnpj(base + cnpj_check_digits(base))
+
+
+async def settings_crud_user(base_url, user, recorder, deadline):
+    from nicegui_client import PageSession
+    rng = random.Random(user)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        await login(client, user)
+        response = await client.get("/settings")
+        response.raise_for_status()
+        page = PageSession(base_url, response.text, dict(client.cookies))
+    await page.connect()
+    try:
+        table = page.find(lambda e: any(l.get("type") == "request" for l in e.get("events", [])))
+        placeholders = ["Nome da empresa", "00.000.000/0000-00", "00000-000", "Número", "Cidade", "UF"]
+        inputs = {placeholder: page.by_placeholder(placeholder) for placeholder in placeholders}
+        add_button = page.by_text("Adicionar")
+        n = 0
+        while time.perf_counter() < deadline:
+            name = f"Bench {user} {n}"
+            values = {
+                "Nome da empresa": name,
+                "00.000.000/0000-00": form_cnpj(rng),
+                "00000-000": f"{rng.randrange(100000):05d}-{rng.randrange(1000):03d}",
+                "Número": str(n),
+                "Cidade": "Campinas",
+                "UF": "SP",
+            }
+            try:
+                # Create: fill the add form and submit.
+                for placeholder, value in values.items():
+                    await page.set_value(inputs[placeholder], value)
+                await recorder.time(page.click(add_button))
+                # Read: page through and search the server-side table.
+                pagination = {"page": rng.randrange(1, 20), "rowsPerPage": 20,
+                              "sortBy": "company_name", "descending": bool(n % 2)}
+                await recorder.time(page.emit(table, "request", {"pagination": pagination, "filter": ""}))
+                await recorder.time(page.emit(table, "request", {"pagination": dict(pagination, page=1),
+                                                                 "filter": name}))
+                # Delete: select the new row and remove it.
+                rows = page.elements[table].get("props", {}).get("rows", [])
+                row = next((r for r in rows if r.get("company_name") == name), None)
+                if row:
+                    await page.emit(table, "selection", [row["_id"]], wait=False)
+                    await recorder.time(page.click(page.by_text("Excluir")))
+            except Exception:
+                recorder.errors += 1
+            n += 1
+    finally:
+        await page.close()
+
+
+SCENARIO_USERS = {
+    "navigation": navigation_user,
+    "login": login_user,
+    "settings_crud": settings_crud_user,
+}
+
+
+async def run_scenario(name, base_url, pid, users, duration):
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    with MemorySampler(pid) as memory:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(SCENARIO_USERS[name](base_url, f"{name}-{i}", recorder, deadline) for i in range(users)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+    failures = [r for r in results if isinstance(r, Exception)]
+    for failure in failures[:3]:
+        print(f"[BENCH] {name}: virtual user failed: {failure!r}")
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "requests": len(recorder.samples),
+        "errors": recorder.errors + len(failures),
+        "p50_ms": ms(percentile(recorder.samples, 50)),
+        "p95_ms": ms(percentile(recorder.samples, 95)),
+        "p99_ms": ms(percentile(recorder.samples, 99)),
+        "mean_ms": ms(statistics.fmean(recorder.samples)) if recorder.samples else None,
+        "throughput_rps": round(len(recorder.samples) / elapsed, 2),
+        "rss_start_mb": round(memory.start_rss / 2 ** 20, 1),
+        "rss_peak_mb": round(memory.peak_rss / 2 ** 20, 1),
+        "rss_end_mb": round(memory.end_rss / 2 ** 20, 1),
+    }
+
+
+# === App Process ===
+
+def start_app(port):
+    env = dict(os.environ, PORT=str(port), NICEGUI_RELOAD="0")
+    return subprocess.Popen([sys.executable, os.path.join(HERE, "app.py")], env=env)
+
+
+async def wait_ready(base_url, process, timeout=120):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"app exited with {process.returncode}")
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("app did not become ready")
+
+
+# === Baselines ===
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if previous.get(key) and current.get(key) and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name} {key}: {previous[key]} -> {current[key]}")
+        if previous.get("throughput_rps") and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name} throughput_rps: {previous['throughput_rps']} -> {current['throughput_rps']}")
+        if previous.get("rss_peak_mb") and current["rss_peak_mb"] > previous["rss_peak_mb"] * (1 + tolerance):
+            regressions.append(f"{name} rss_peak_mb: {previous['rss_peak_mb']} -> {current['rss_peak_mb']}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load benchmarks for the ATS app.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users per scenario")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--url", help="benchmark an already running app instead of booting one")
+    parser.add_argument("--pid", type=int, help="process id of --url's server, for memory figures")
+    parser.add_argument("--baseline", default="default", help="baseline name under benchmarks/baselines/")
+    parser.add_argument("--save", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="fail if worse than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    sys.path[:0] = [HERE, os.path.dirname(HERE)]
+    process = None
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    if not args.url:
+        process = start_app(args.port)
+    try:
+        if process:
+            await wait_ready(base_url, process)
+        pid = args.pid or (process.pid if process else os.getpid())
+        results = {}
+        for name in args.scenarios.split(","):
+            print(f"[BENCH] Running {name}: {args.users} users for {args.duration:g}s")
+            results[name] = await run_scenario(name, base_url, pid, args.users, args.duration)
+            print(f"[BENCH] {name}: {json.dumps(results[name])}")
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "users": args.users,
+        "duration": args.duration,
+        "scenarios": results,
+    }
+    exit_code = 0
+    if args.compare:
+        path = baseline_path(args.baseline)
+        if not os.path.exists(path):
+            print(f"[BENCH] No baseline at {path}; run with --save first")
+            exit_code = 2
+        else:
+            with open(path, encoding="utf-8") as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            for regression in regressions:
+                print(f"[BENCH] Regression: {regression}")
+            exit_code = 1 if regressions else 0
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.baseline), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Saved baseline {args.baseline}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Per-row cost of CNPJ validation over a large column:
+#
+#   python benchmarks/validation.py --rows 1000000
+#
+# Compares one validate_cnpj call per row with the batch API, with and
+# without NumPy.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import validation
+from utils.validation import cnpj_check_digits, format_cnpj, validate_cnpj, validate_cnpjs
+
+
+def make_column(rows, seed=7):
+    # Two thirds valid; the rest have a wrong last digit. Half are formatted.
+    rng = random.Random(seed)
+    column = []
+    for i in range(rows):
+        base = "".join(rng.choices("0123456789", k=12))
+        cnpj = base + cnpj_check_digits(base)
+        if i % 3 == 0:
+            cnpj = cnpj[:13] + str((int(cnpj[13]) + 1) % 10)
+        column.append(format_cnpj(cnpj) if i % 2 else cnpj)
+    return column
+
+
+def timed(label, fn, rows):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"[BENCH] {label:<24} {elapsed:7.3f}s  {elapsed / rows * 1e9:8.0f} ns/row")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CNPJ validation micro-benchmark.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    column = make_column(args.rows)
+    scalar = timed("validate_cnpj per row", lambda: [validate_cnpj(v) for v in column], args.rows)
+    numpy_module = validation.np
+    if numpy_module is not None:
+        batch = timed("validate_cnpjs (numpy)", lambda: validate_cnpjs(column), args.rows)
+        assert batch == scalar
+    validation.np = None
+    try:
+        fallback = timed("validate_cnpjs (no numpy)", lambda: validate_cnpjs(column), args.rows)
+    finally:
+        validation.np = numpy_module
+    assert fallback == scalar
+    print(f"[BENCH] {sum(scalar)} of {args.rows} valid")
+
+
+if __name__ == "__main__":
+    main()
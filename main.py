@@ -1,54 +1,286 @@
+import asyncio
+import hmac
 import os
-from datetime import datetime, timedelta
-from fastapi import Request
-from fastapi.responses import RedirectResponse
+from fastapi import Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
 from starlette.middleware.sessions import SessionMiddleware
 
-from nicegui import ui, app
-import jwt
+from nicegui import ui, app, background_tasks, Client
 from utils.auth import (
-    oauth, users_collection, JWT_TOKEN_KEY, JWT_TOKEN_LIFETIME,
-    APP_STORAGE_SECRET, get_current_user, BASE_URL
+    get_oauth, JWT_TOKEN_KEY, get_current_user, BASE_URL, APP_STORAGE_SECRET, user_cache, invalidate_user,
+    create_session_token, set_session_cookie, decode_jwt_token, session_needs_refresh,
+    revoke_session, revocation_sync
 )
+from utils.oauth_metadata import google_metadata
+from utils.shared import bus
+from utils.db import ping, pool_stats
+from utils import bulk_import, metrics
+from utils.repository import upsert_user, shutdown_executor, run_db
+from utils.startup import startup
+from utils.health import prober
+from utils.cep import cep_service
+from utils.indexes import ensure_indexes
+from utils.search import backfill_search_fields
+from utils.stats import summary_refresher
+from utils.changes import company_feed, start_company_feed
+from utils.export import EXPORT_FORMATS, export_query, export_companies
+from reports.jobs import report_queue, DONE
+from reports import render as report_render
 from components.header import render_header
 from components.footer import render_footer
 from components.menu import render_menu
-from pages.dashboard import dashboard_page
-from pages.settings import settings_page
 
 # === Add Session Middleware ===
 app.add_middleware(SessionMiddleware, secret_key=APP_STORAGE_SECRET)
 
+app.on_shutdown(shutdown_executor)
+app.on_shutdown(bulk_import.shutdown_executor)
+
+# === Startup Tasks ===
+# Nothing here blocks the server from binding: connecting to Mongo, OAuth
+# registration and index checks run as background steps and report their
+# state through utils.startup (see /internal/startup).
+
+async def connect_database():
+    await run_db(ping)
+
+async def bootstrap_indexes():
+    if os.getenv("MONGO_ENSURE_INDEXES", "1") != "1":
+        return
+    try:
+        await run_db(ensure_indexes)
+    finally:
+        # Independent of the indexes; runs even when a unique index is blocked.
+        await run_db(backfill_search_fields)
+
+async def register_oauth():
+    client = get_oauth().google
+    if google_metadata.fixed_file:
+        # Read up front so a broken file fails this step with its own error.
+        await google_metadata.load(client)
+    # Prefetches discovery metadata and JWKS, then keeps them fresh in the background.
+    background_tasks.create(google_metadata.keep_fresh(client), name='oauth_metadata')
+
+async def load_cep_index():
+    # Maps the index ahead of the first lookup; a missing file only disables autofill.
+    await run_db(lambda: cep_service.available)
+
+async def warm_report_renderers():
+    if os.getenv("REPORT_RENDER_WARMUP", "1") == "1":
+        await asyncio.get_running_loop().run_in_executor(None, report_render.warm_up)
+
+def start_background_steps():
+    startup.start("database", connect_database, retry=True)
+    startup.start("indexes", bootstrap_indexes, required=False, after=["database"])
+    startup.start("oauth", register_oauth)
+    startup.start("report_renderers", warm_report_renderers, required=False)
+    startup.start("cep_index", load_cep_index, required=False)
+
+app.on_startup(start_background_steps)
+app.on_startup(bus.start)
+app.on_shutdown(bus.stop)
+app.on_startup(start_company_feed)
+app.on_shutdown(company_feed.stop)
+async def start_report_queue():
+    # Workers serve new jobs at once; jobs left over from before the restart
+    # are picked up once Mongo is reachable.
+    await report_queue.start()
+    startup.start("report_jobs", report_queue.load_pending, required=False, retry=True, after=["database"])
+
+app.on_startup(start_report_queue)
+app.on_shutdown(report_queue.stop)
+app.on_shutdown(report_render.shutdown)
+
+def start_summary_refresher():
+    background_tasks.create(summary_refresher(), name='summary_refresher')
+
+app.on_startup(start_summary_refresher)
+
+def start_revocation_sync():
+    background_tasks.create(revocation_sync(), name='revocation_sync')
+
+app.on_startup(start_revocation_sync)
+
+def start_loop_lag_monitor():
+    background_tasks.create(metrics.measure_loop_lag(), name='loop_lag')
+
+app.on_startup(start_loop_lag_monitor)
+
+def start_health_prober():
+    background_tasks.create(prober.run(), name='health_prober')
+
+app.on_startup(start_health_prober)
+
+# === Sliding Session Refresh ===
+
+@app.middleware("http")
+async def refresh_session(request: Request, call_next):
+    response = await call_next(request)
+    token = request.cookies.get(JWT_TOKEN_KEY)
+    if token and not request.url.path.startswith("/_nicegui"):
+        data = decode_jwt_token(token)
+        if data and data.get("name") and session_needs_refresh(data):
+            set_session_cookie(response, create_session_token(data, sid=data.get("sid")))
+    return response
+
+# === Metrics ===
+# Installed after the other middleware so its timing wraps them too.
+metrics.install(app)
+
+metrics.registry.set_gauge("ats_websocket_clients", lambda: len(Client.instances), "Connected NiceGUI clients.")
+metrics.registry.set_gauge("ats_mongo_connections_in_use", lambda: pool_stats()["in_use"], "Checked-out Mongo connections.")
+metrics.registry.set_gauge("ats_user_cache_entries", lambda: len(user_cache), "Cached user documents.")
+metrics.registry.set_gauge("ats_report_jobs_queued", lambda: report_queue.stats()["queued"], "Report jobs waiting for a worker.")
+metrics.registry.set_gauge("ats_report_jobs_running", lambda: report_queue.stats()["running"], "Report jobs being rendered.")
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(content=metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+# === Health Checks ===
+HEALTH_MAX_LOOP_LAG = float(os.getenv("HEALTH_MAX_LOOP_LAG", "1"))
+HEALTH_MAX_QUEUED_REPORTS = int(os.getenv("HEALTH_MAX_QUEUED_REPORTS", "50"))
+
+async def check_mongo():
+    started = asyncio.get_running_loop().time()
+    await run_db(ping)
+    latency_ms = round((asyncio.get_running_loop().time() - started) * 1000, 1)
+    return True, dict(pool_stats(), ping_ms=latency_ms)
+
+async def check_oauth_metadata():
+    # Stale metadata still lets users log in; missing metadata does not.
+    status = google_metadata.status()
+    return status["loaded"], status
+
+async def check_report_queue():
+    stats = report_queue.stats()
+    return stats["queued"] <= HEALTH_MAX_QUEUED_REPORTS, stats
+
+async def check_loop_lag():
+    lag = metrics.registry.loop_lag
+    return lag <= HEALTH_MAX_LOOP_LAG, {"lag_seconds": round(lag, 4)}
+
+prober.add_check("mongo", check_mongo)
+prober.add_check("oauth_metadata", check_oauth_metadata)
+prober.add_check("report_queue", check_report_queue, critical=False)
+prober.add_check("event_loop", check_loop_lag, critical=False)
+
+@app.get("/healthz")
+async def healthz():
+    status = prober.liveness()
+    return JSONResponse(status, status_code=200 if status["alive"] else 503)
+
+@app.get("/readyz")
+async def readyz():
+    # Public, so only the verdict; the per-check details are on /internal/health.
+    ready = prober.readiness()["ready"]
+    return JSONResponse({"ready": ready}, status_code=200 if ready else 503)
+
+# === Internal Routes ===
+# Operator endpoints: open to a signed-in user or to a request carrying
+# "Authorization: Bearer $INTERNAL_TOKEN" (for scripts and monitoring).
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN")
+
+async def require_internal_access(request: Request):
+    if INTERNAL_TOKEN:
+        supplied = request.headers.get("authorization", "").encode()
+        if hmac.compare_digest(supplied, f"Bearer {INTERNAL_TOKEN}".encode()):
+            return
+    if not await get_current_user(request):
+        raise HTTPException(status_code=403)
+
+internal_only = [Depends(require_internal_access)]
+
+@app.get("/internal/db/pool", dependencies=internal_only)
+async def db_pool_stats():
+    return pool_stats()
+
+@app.get("/internal/cache/users", dependencies=internal_only)
+async def user_cache_stats():
+    return user_cache.stats()
+
+@app.get("/internal/health", dependencies=internal_only)
+async def health_details():
+    return prober.readiness()
+
+@app.get("/internal/startup", dependencies=internal_only)
+async def startup_status():
+    return startup.status()
+
+@app.get("/internal/oauth/metadata", dependencies=internal_only)
+async def oauth_metadata_status():
+    return google_metadata.status()
+
+@app.get("/internal/cache/reports", dependencies=internal_only)
+async def report_cache_stats():
+    return report_queue.cache.stats() if report_queue.cache else {}
+
+# === Export Routes ===
+
+@app.get("/export/companies")
+async def export_companies_route(request: Request, format: str = "csv", gzip: bool = False,
+                                 q: str = None, state: str = None, city: str = None):
+    user = await get_current_user(request)
+    if not user:
+        return RedirectResponse("/")
+    if format not in EXPORT_FORMATS:
+        return Response(status_code=400, content=f"Formato inválido: {format}")
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"empresas.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", f"{filename}.gz"
+    # A sync iterator is run in Starlette's threadpool, so the cursor never blocks the loop.
+    return StreamingResponse(
+        export_companies(export_query(q, state, city), format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# === Report Routes ===
+
+@app.get("/reports/{job_id}/download")
+async def download_report(request: Request, job_id: str):
+    user = await get_current_user(request)
+    if not user:
+        return RedirectResponse("/")
+    job = await report_queue.find(job_id)
+    if not job or job.owner != user["email"] or job.status != DONE or not job.artifact:
+        return Response(status_code=404, content="Relatório não encontrado")
+    etag = f'"{job.etag}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    if not os.path.exists(job.artifact):
+        return Response(status_code=404, content="Relatório expirado. Gere novamente.")
+    filename = f"{job.report_type}-{job.created:%Y%m%d-%H%M}{os.path.splitext(job.artifact)[1]}"
+    return FileResponse(job.artifact, filename=filename, headers={"ETag": etag})
+
 # === Auth Routes (Google OAuth) ===
 
 @app.get("/oauth/google/login")
 async def login(request: Request):
-    return await oauth.google.authorize_redirect(request, f"{BASE_URL}/oauth/google/redirect")
+    return await get_oauth().google.authorize_redirect(request, f"{BASE_URL}/oauth/google/redirect")
 
 @app.get("/oauth/google/redirect")
 async def auth_redirect(request: Request):
-    token = await oauth.google.authorize_access_token(request)
+    token = await get_oauth().google.authorize_access_token(request)
     userinfo = token.get("userinfo")
     if not userinfo:
         return RedirectResponse("/")
-    user = users_collection.find_one({"email": userinfo["email"]})
-    if not user:
-        users_collection.insert_one({
-            "email": userinfo["email"],
-            "name": userinfo["name"],
-            "picture": userinfo.get("picture"),
-            "created": datetime.utcnow()
-        })
-    jwt_token = jwt.encode({
-        "email": userinfo["email"],
-        "exp": datetime.utcnow() + JWT_TOKEN_LIFETIME
-    }, APP_STORAGE_SECRET, algorithm="HS256")
+    # One round trip: creates the user on first login, refreshes name/picture otherwise.
+    user = await upsert_user(userinfo)
+    # New tokens carry name and picture, so the user cache is not warmed here;
+    # other workers still drop stale copies held for legacy tokens.
+    invalidate_user(user["email"])
     response = RedirectResponse("/dashboard")
-    response.set_cookie(key=JWT_TOKEN_KEY, value=jwt_token, httponly=True, max_age=7*24*3600)
+    set_session_cookie(response, create_session_token(userinfo))
     return response
 
 @ui.page('/logout')
 async def logout(request: Request):
+    token = request.cookies.get(JWT_TOKEN_KEY)
+    data = decode_jwt_token(token) if token else None
+    if data:
+        await revoke_session(data)
     response = RedirectResponse("/")
     response.delete_cookie(JWT_TOKEN_KEY)
     return response
@@ -57,7 +289,7 @@ async def logout(request: Request):
 
 @ui.page('/')
 async def home(request: Request):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     render_header(user)
     if user:
         return ui.navigate.to('/dashboard')
@@ -74,19 +306,22 @@ async def home(request: Request):
 
 @ui.page('/dashboard')
 async def dashboard(request: Request):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return ui.navigate.to('/')
-    dashboard_page(user)
+    # Page modules are imported on first visit, not at worker start.
+    from pages.dashboard import dashboard_page
+    await dashboard_page(user)
 
 @ui.page('/settings')
 async def settings(request: Request):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return ui.navigate.to('/')
-    settings_page(user)
+    from pages.settings import settings_page
+    await settings_page(user)
 
 if __name__ in {'__main__', '__mp_main__'}:
     port = int(os.environ.get("PORT", 8080))
-    ui.run(host="0.0.0.0", port=port)
+    ui.run(host="0.0.0.0", port=port, reload=os.environ.get("NICEGUI_RELOAD", "1") == "1")
     #ui.run()
@@ -1,9 +1,65 @@
-from nicegui import ui
+from nicegui import ui, context
 from components.header import render_header
 from components.footer import render_footer
 from components.menu import render_menu
+from reports.definitions import REPORT_TYPES
+from reports.jobs import report_queue, RUNNING, DONE, FAILED
+from utils.repository import run_db
+from utils.stats import load_summary
 
-def dashboard_page(user):
+STATUS_LABELS = {
+    "queued": "Na fila",
+    "running": "Gerando",
+    "done": "Concluído",
+    "failed": "Falhou",
+    "cancelled": "Cancelado",
+}
+
+def summary_data(summary, name):
+    return summary.get(name, {}).get('data', [])
+
+def render_summary(summary):
+    by_state = summary_data(summary, 'companies_by_state')
+    recent = summary_data(summary, 'recent_companies')
+    users = summary_data(summary, 'users_by_month')
+    with ui.row().classes('gap-4'):
+        for title, value in (
+            ('Empresas', sum(s['count'] for s in by_state)),
+            ('Novas (30 dias)', sum(d['count'] for d in recent)),
+            ('Usuários', sum(u['count'] for u in users)),
+        ):
+            with ui.card().classes('p-4 items-center'):
+                ui.label(str(value)).classes('text-2xl font-bold')
+                ui.label(title).classes('text-gray-500')
+    with ui.row().classes('gap-8 items-start mt-4'):
+        ui.table(
+            columns=[
+                {'name': 'state', 'label': 'UF', 'field': 'state'},
+                {'name': 'count', 'label': 'Empresas', 'field': 'count'},
+            ],
+            rows=[{'state': s['_id'] or '-', 'count': s['count']} for s in by_state[:10]],
+            row_key='state',
+        ).props('dense flat')
+        ui.table(
+            columns=[
+                {'name': 'city', 'label': 'Cidade', 'field': 'city'},
+                {'name': 'state', 'label': 'UF', 'field': 'state'},
+                {'name': 'count', 'label': 'Empresas', 'field': 'count'},
+            ],
+            rows=[dict(c, key=f"{c.get('city')}/{c.get('state')}") for c in summary_data(summary, 'companies_by_city')[:10]],
+            row_key='key',
+        ).props('dense flat')
+        ui.table(
+            columns=[
+                {'name': 'month', 'label': 'Mês', 'field': 'month'},
+                {'name': 'count', 'label': 'Novos usuários', 'field': 'count'},
+            ],
+            rows=[{'month': u['_id'], 'count': u['count']} for u in users[-12:]],
+            row_key='month',
+        ).props('dense flat')
+
+async def dashboard_page(user):
+    summary = await run_db(load_summary)
     render_header(user)
     with ui.row().classes('w-full h-screen items-start justify-start mt-0'):
         with ui.column().classes('w-1/4 min-h-[60vh]'):
@@ -12,4 +68,67 @@ def dashboard_page(user):
                 if user.get("picture"):
                     ui.image(user["picture"]).classes('w-32 h-32 rounded-full mb-4')
             ui.label('Página para gerar relatórios.').classes('mb-4')
+        with ui.column().classes('w-2/3 p-4 items-start'):
+            ui.label('Resumo').classes('text-lg font-bold mb-2')
+            render_summary(summary)
+            ui.label('Gerar relatório').classes('text-lg font-bold mb-2 mt-8')
+            with ui.row().classes('items-end gap-4'):
+                report_type = ui.select(
+                    {key: definition['label'] for key, definition in REPORT_TYPES.items()},
+                    value=next(iter(REPORT_TYPES)),
+                    label='Relatório',
+                ).classes('w-64')
+                state = ui.input('UF (opcional)').classes('w-20').props('maxlength=2')
+
+                async def generate():
+                    params = {'state': (state.value or '').strip().upper()}
+                    job, error = await report_queue.submit(user['email'], report_type.value, params)
+                    if error:
+                        ui.notify(error, color='negative')
+                    else:
+                        ui.notify('Relatório adicionado à fila', color='positive')
+
+                ui.button('Gerar', on_click=generate).props('color=primary')
+
+            ui.label('Meus relatórios').classes('text-lg font-bold mb-2 mt-8')
+
+            @ui.refreshable
+            def jobs_list():
+                jobs = report_queue.jobs_for(user['email'])
+                if not jobs:
+                    ui.label('Nenhum relatório gerado.')
+                    return
+                for job in jobs:
+                    with ui.row().classes('w-full items-center gap-4'):
+                        ui.label(job.label)
+                        ui.label(f'{job.created:%d/%m/%Y %H:%M}').classes('text-gray-500')
+                        ui.label(STATUS_LABELS[job.status])
+                        if job.status == RUNNING:
+                            ui.linear_progress(show_value=False).classes('w-32').bind_value_from(job, 'progress')
+                        if job.active:
+                            ui.button('Cancelar', on_click=lambda j=job: report_queue.cancel(j.id, user['email'])).props('flat color=negative')
+                        if job.status == DONE:
+                            ui.button('Baixar', on_click=lambda j=job: ui.download(f'/reports/{j.id}/download')).props('flat')
+                        if job.status == FAILED:
+                            ui.label(job.error or '').classes('text-red-500')
+
+            jobs_list()
+
+            # Progress is bound directly; the list is only rebuilt when a status changes.
+            seen_status = {}
+
+            def on_job_change(job):
+                if seen_status.get(job.id) != job.status:
+                    seen_status[job.id] = job.status
+                    jobs_list.refresh()
+
+            context.client.on_disconnect(report_queue.subscribe(user['email'], on_job_change))
+
+            def resubscribe():
+                # A reconnect after a network blip keeps this page: listen again
+                # and redraw in case a status changed meanwhile.
+                report_queue.subscribe(user['email'], on_job_change)
+                jobs_list.refresh()
+
+            context.client.on_connect(resubscribe)
     render_footer()
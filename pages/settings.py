@@ -1,69 +1,42 @@
-from nicegui import ui
+from urllib.parse import urlencode
+from nicegui import ui, context
+from pymongo.errors import ExecutionTimeout, PyMongoError
 from components.header import render_header
 from components.footer import render_footer
 from components.menu import render_menu
-from pymongo import MongoClient
-from bson.objectid import ObjectId
-import re
-import os
-
-MONGO_URI = os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise RuntimeError("MONGO_URI environment variable not set")
-MONGO_DB = os.getenv("MONGODB_DB", "report_generator")
-MONGO_COLLECTION = os.getenv("MONGODB_COMPANIES_COLLECTION", "companies")
-
-def get_mongo_collection():
-    client = MongoClient(MONGO_URI)
-    db = client[MONGO_DB]
-    return db[MONGO_COLLECTION]
-
-def get_all_companies():
-    collection = get_mongo_collection()
-    return list(collection.find({}, {
-        "_id": 1,
-        "company_name": 1,
-        "company_CNPJ": 1,
-        "company_address_CEP": 1,
-        "company_address_number": 1,
-        "company_address_additional": 1,
-        "company_address_city": 1,
-        "company_address_state": 1,
-    }))
-
-def add_company(data):
-    collection = get_mongo_collection()
-    if collection.find_one({"company_CNPJ": data["company_CNPJ"]}):
-        return False, "Empresa com este CNPJ já existe."
-    result = collection.insert_one(data)
-    return True, f"Empresa adicionada com id {result.inserted_id}"
-
-def update_company(company_id, data):
-    collection = get_mongo_collection()
-    result = collection.update_one(
-        {"_id": ObjectId(company_id)},
-        {"$set": data}
-    )
-    return result.modified_count > 0
-
-def delete_company(company_id):
-    collection = get_mongo_collection()
-    result = collection.delete_one({"_id": ObjectId(company_id)})
-    return result.deleted_count > 0
-
-def validate_cnpj(cnpj):
-    return bool(re.fullmatch(r"\d{3}\.\d{3}\.\d{3}/\d{4}-\d{2}", cnpj))
-
-def validate_cep(cep):
-    return bool(re.fullmatch(r"\d{5}-\d{3}", cep))
-
-def validate_state(state):
-    return bool(re.fullmatch(r"[A-Za-z]{2}", state))
+from utils.changes import company_feed
+from utils.bulk_import import ImportJob, import_companies, error_report_csv
+from utils.repository import get_company, find_companies_page, add_company, update_company, delete_company
+from utils.validation import validate_cnpj, validate_cep, validate_state
+from utils.cep import cep_service, check_address
+
+def company_to_row(c):
+    return {
+        'company_name': c.get('company_name', ''),
+        'company_CNPJ': c.get('company_CNPJ', ''),
+        'company_address_CEP': c.get('company_address_CEP', ''),
+        'company_address_number': c.get('company_address_number', ''),
+        'company_address_additional': c.get('company_address_additional', ''),
+        'company_address_city': c.get('company_address_city', ''),
+        'company_address_state': c.get('company_address_state', ''),
+        '_id': str(c.get('_id', '')),
+    }
+
+def autofill_address(cep_value, city_input, state_input, feedback):
+    # Only complete CEPs are looked up; the mask reports every keystroke.
+    if not validate_cep(cep_value or ''):
+        return
+    place = cep_service.lookup(cep_value)
+    if place:
+        city_input.value, state_input.value = place
+        feedback.text = ''
+    elif cep_service.available:
+        feedback.text = 'CEP não encontrado.'
 
 def required_label(text):
     return ui.html(f'<span style="color: #e53935;">*</span> {text}').classes('font-bold')
 
-def settings_page(user):
+async def settings_page(user):
     render_header(user)
     with ui.row().classes('w-full items-start mt-0 pt-0'):
         with ui.column().classes('w-1/4 min-h-[60vh] items-start pt-0 mt-0'):
@@ -73,41 +46,106 @@ def settings_page(user):
             ui.label('Empresas cadastradas').classes('text-lg font-bold mb-2 mt-2')
 
             columns = [
-                {'name': 'company_name', 'label': 'Empresa', 'field': 'company_name'},
-                {'name': 'company_CNPJ', 'label': 'CNPJ', 'field': 'company_CNPJ'},
-                {'name': 'company_address_CEP', 'label': 'CEP', 'field': 'company_address_CEP'},
-                {'name': 'company_address_number', 'label': 'Número', 'field': 'company_address_number'},
-                {'name': 'company_address_additional', 'label': 'Complemento', 'field': 'company_address_additional'},
-                {'name': 'company_address_city', 'label': 'Cidade', 'field': 'company_address_city'},
-                {'name': 'company_address_state', 'label': 'UF', 'field': 'company_address_state'},
+                {'name': 'company_name', 'label': 'Empresa', 'field': 'company_name', 'sortable': True},
+                {'name': 'company_CNPJ', 'label': 'CNPJ', 'field': 'company_CNPJ', 'sortable': True},
+                {'name': 'company_address_CEP', 'label': 'CEP', 'field': 'company_address_CEP', 'sortable': True},
+                {'name': 'company_address_number', 'label': 'Número', 'field': 'company_address_number', 'sortable': True},
+                {'name': 'company_address_additional', 'label': 'Complemento', 'field': 'company_address_additional', 'sortable': True},
+                {'name': 'company_address_city', 'label': 'Cidade', 'field': 'company_address_city', 'sortable': True},
+                {'name': 'company_address_state', 'label': 'UF', 'field': 'company_address_state', 'sortable': True},
             ]
 
-            def get_table_data():
-                companies = get_all_companies()
-                return [
-                    {
-                        'company_name': c.get('company_name', ''),
-                        'company_CNPJ': c.get('company_CNPJ', ''),
-                        'company_address_CEP': c.get('company_address_CEP', ''),
-                        'company_address_number': c.get('company_address_number', ''),
-                        'company_address_additional': c.get('company_address_additional', ''),
-                        'company_address_city': c.get('company_address_city', ''),
-                        'company_address_state': c.get('company_address_state', ''),
-                        '_id': str(c.get('_id', '')),
-                    } for c in companies
-                ]
+            # Server-side pagination: the table only ever holds the current page.
+            pagination = {
+                'page': 1,
+                'rowsPerPage': 20,
+                'sortBy': 'company_name',
+                'descending': False,
+                'rowsNumber': 0,
+            }
+
+            # Results of a query superseded by a newer one are dropped on arrival.
+            request_seq = {'n': 0}
+
+            async def load_page(new_pagination=None, filter_text=None):
+                request_seq['n'] += 1
+                seq = request_seq['n']
+                requested = dict(pagination, **(new_pagination or {}))
+                try:
+                    companies, total = await find_companies_page(
+                        requested['page'],
+                        requested['rowsPerPage'],
+                        requested.get('sortBy'),
+                        requested.get('descending', False),
+                        filter_text if filter_text is not None else company_table.filter,
+                    )
+                except ExecutionTimeout:
+                    # Bounded by COMPANY_SEARCH_MAX_TIME_MS; very broad filters can hit it.
+                    if seq == request_seq['n']:
+                        ui.notify('A busca demorou demais. Refine o filtro.', color='warning')
+                    return
+                except PyMongoError as e:
+                    print(f"[DB] Company page query failed: {e}")
+                    if seq == request_seq['n']:
+                        ui.notify('Não foi possível carregar as empresas. Tente novamente.', color='negative')
+                    return
+                if seq != request_seq['n']:
+                    return
+                pagination.update(requested)
+                pagination['rowsNumber'] = total
+                company_table.rows = [company_to_row(c) for c in companies]
+                company_table.pagination = dict(pagination)
+
+            def export_table(fmt):
+                params = urlencode({'format': fmt, 'gzip': 'true', 'q': company_table.filter or ''})
+                ui.download(f'/export/companies?{params}')
 
             selected_row = {'data': None}
 
-            def refresh_table():
-                company_table.rows = get_table_data()
-                company_table.update()
+            def clear_selection():
+                company_table.selected = []
                 selected_row['data'] = None
                 action_row.visible = False
 
-            def open_edit_dialog(row):
+            # Mutations patch the current page in place instead of reloading it.
+            def patch_row(company):
+                row = company_to_row(company)
+                for i, r in enumerate(company_table.rows):
+                    if r['_id'] == row['_id']:
+                        company_table.rows[i] = row
+                        company_table.update()
+                        return
+
+            def insert_row(company):
+                company_table.rows.insert(0, company_to_row(company))
+                del company_table.rows[pagination['rowsPerPage']:]
+                pagination['rowsNumber'] += 1
+                company_table.pagination = dict(pagination)
+
+            def remove_row(company_id):
+                company_table.rows[:] = [r for r in company_table.rows if r['_id'] != company_id]
+                pagination['rowsNumber'] = max(0, pagination['rowsNumber'] - 1)
+                company_table.pagination = dict(pagination)
+
+            # Changes made by other sessions arrive through the shared change feed.
+            def apply_changes(events):
+                on_page = {r['_id'] for r in company_table.rows}
+                for event in events:
+                    company_id = event['_id']
+                    if event['op'] == 'delete':
+                        if company_id in on_page:
+                            remove_row(company_id)
+                            if selected_row['data'] and selected_row['data']['_id'] == company_id:
+                                clear_selection()
+                    elif event['document'] is not None:
+                        if company_id in on_page:
+                            patch_row(event['document'])
+                        elif event['op'] == 'insert' and not company_table.filter:
+                            insert_row(event['document'])
+
+            async def open_edit_dialog(row):
                 company_id = row['_id']
-                company = next((c for c in get_all_companies() if str(c['_id']) == str(company_id)), None)
+                company = await get_company(company_id)
                 if not company:
                     ui.notify('Empresa não encontrada', color='negative')
                     return
@@ -116,22 +154,30 @@ def settings_page(user):
                     with ui.row().classes('w-full'):
                         with ui.column().classes('w-1/2'):
                             edit_name = ui.input('Nome da empresa', value=company.get('company_name', '')).classes('w-full')
-                            edit_cnpj = ui.input('CNPJ (000.000.000/0000-00)', value=company.get('company_CNPJ', '')).classes('w-full').props('mask=###.###.###/####-##')
-                            edit_cep = ui.input('CEP (00000-000)', value=company.get('company_address_CEP', '')).classes('w-full').props('mask=#####-###')
+                            original_cnpj = company.get('company_CNPJ', '')
+                            edit_cnpj = ui.input('CNPJ (00.000.000/0000-00)', value=original_cnpj).classes('w-full')
+                            # Legacy CNPJs in the old 15-digit layout are shown as stored; the mask would cut them.
+                            if not original_cnpj or validate_cnpj(original_cnpj):
+                                edit_cnpj.props('mask=##.###.###/####-##')
+                            edit_cep = ui.input(
+                                'CEP (00000-000)', value=company.get('company_address_CEP', ''),
+                                on_change=lambda e: autofill_address(e.value, edit_city, edit_state, edit_msg),
+                            ).classes('w-full').props('mask=#####-###')
                             edit_number = ui.input('Número', value=company.get('company_address_number', '')).classes('w-full')
                         with ui.column().classes('w-1/2'):
                             edit_additional = ui.input('Complemento', value=company.get('company_address_additional', '')).classes('w-full')
                             edit_city = ui.input('Cidade', value=company.get('company_address_city', '')).classes('w-full')
                             edit_state = ui.input('UF', value=company.get('company_address_state', '')).classes('w-20').props('maxlength=2')
                     edit_msg = ui.label().classes('mt-2 text-red-500')
-                    def save_edit():
+                    async def save_edit():
                         if not (
                             edit_name.value and edit_cnpj.value and edit_cep.value and edit_city.value and edit_state.value
                         ):
                             edit_msg.text = "Preencha todos os campos obrigatórios."
                             return
-                        if not validate_cnpj(edit_cnpj.value):
-                            edit_msg.text = "CNPJ inválido. Use o formato 000.000.000/0000-00."
+                        # Only a changed CNPJ must pass the new check, so legacy records stay editable.
+                        if edit_cnpj.value != original_cnpj and not validate_cnpj(edit_cnpj.value):
+                            edit_msg.text = "CNPJ inválido. Confira o formato 00.000.000/0000-00 e os dígitos verificadores."
                             return
                         if not validate_cep(edit_cep.value):
                             edit_msg.text = "CEP inválido. Use o formato 00000-000."
@@ -139,6 +185,17 @@ def settings_page(user):
                         if not validate_state(edit_state.value):
                             edit_msg.text = "UF inválido. Use dois caracteres."
                             return
+                        # Likewise the CEP cross-check only applies when the address was changed.
+                        address = (edit_cep.value, edit_city.value, edit_state.value.upper())
+                        stored_address = (
+                            company.get('company_address_CEP', ''),
+                            company.get('company_address_city', ''),
+                            company.get('company_address_state', '').upper(),
+                        )
+                        address_error = check_address(*address) if address != stored_address else None
+                        if address_error:
+                            edit_msg.text = address_error
+                            return
                         data = {
                             "company_name": edit_name.value,
                             "company_CNPJ": edit_cnpj.value,
@@ -148,32 +205,55 @@ def settings_page(user):
                             "company_address_city": edit_city.value,
                             "company_address_state": edit_state.value.upper(),
                         }
-                        updated = update_company(company_id, data)
+                        updated, error = await update_company(company_id, data, expected_version=company['version'])
                         if updated:
                             ui.notify('Empresa atualizada', color='positive')
                             dialog.close()
-                            refresh_table()
+                            patch_row(updated)
+                            clear_selection()
                         else:
-                            edit_msg.text = "Nenhuma alteração feita ou erro ao atualizar empresa."
+                            edit_msg.text = error
                     ui.button('Salvar', on_click=save_edit).props('color=primary')
                     ui.button('Cancelar', on_click=dialog.close).props('color=secondary')
                 dialog.open()
 
-            def delete_row(row):
+            async def delete_row(row):
                 company_id = row['_id']
-                if delete_company(company_id):
+                if await delete_company(company_id):
                     ui.notify('Empresa excluída', color='positive')
-                    refresh_table()
+                    remove_row(company_id)
+                    clear_selection()
                 else:
                     ui.notify('Erro ao excluir empresa', color='negative')
 
             with ui.element('div').classes('w-full'):
                 company_table = ui.table(
                     columns=columns,
-                    rows=get_table_data(),
+                    rows=[],
                     row_key='_id',
-                    selection='single'
+                    selection='single',
+                    pagination=pagination,
                 ).classes('w-full max-w-full')
+                with company_table.add_slot('top-left'):
+                    ui.button('Exportar CSV', on_click=lambda: export_table('csv')).props('flat')
+                    ui.button('Exportar JSON', on_click=lambda: export_table('ndjson')).props('flat')
+                with company_table.add_slot('top-right'):
+                    ui.input(placeholder='Buscar por nome, CNPJ ou cidade').props('clearable debounce=300').bind_value(company_table, 'filter')
+            await load_page(filter_text='')
+
+            async def on_request(e):
+                await load_page(e.args.get('pagination'), e.args.get('filter') or '')
+
+            company_table.on('request', on_request)
+            context.client.on_disconnect(company_feed.subscribe(apply_changes))
+
+            async def resubscribe():
+                # A reconnect after a network blip keeps this page: listen again
+                # and reload the page to pick up changes missed meanwhile.
+                company_feed.subscribe(apply_changes)
+                await load_page()
+
+            context.client.on_connect(resubscribe)
 
             # Define the callback function first
             def on_selection(e):
@@ -203,10 +283,13 @@ def settings_page(user):
                 with ui.column().classes('w-1/2'):
                     required_label('Nome da empresa')
                     name = ui.input('', placeholder='Nome da empresa').classes('w-full')
-                    required_label('CNPJ (000.000.000/0000-00)')
-                    cnpj = ui.input('', placeholder='000.000.000/0000-00').classes('w-full').props('mask=###.###.###/####-##')
+                    required_label('CNPJ (00.000.000/0000-00)')
+                    cnpj = ui.input('', placeholder='00.000.000/0000-00').classes('w-full').props('mask=##.###.###/####-##')
                     required_label('CEP (00000-000)')
-                    cep = ui.input('', placeholder='00000-000').classes('w-full').props('mask=#####-###')
+                    cep = ui.input(
+                        '', placeholder='00000-000',
+                        on_change=lambda e: autofill_address(e.value, city, state, msg),
+                    ).classes('w-full').props('mask=#####-###')
                     ui.label('Número')
                     number = ui.input('', placeholder='Número').classes('w-full')
                 with ui.column().classes('w-1/2'):
@@ -219,14 +302,14 @@ def settings_page(user):
 
             msg = ui.label().classes('mt-2 text-red-500')
 
-            def submit():
+            async def submit():
                 if not (
                     name.value and cnpj.value and cep.value and city.value and state.value
                 ):
                     msg.text = "Preencha todos os campos obrigatórios."
                     return
                 if not validate_cnpj(cnpj.value):
-                    msg.text = "CNPJ inválido. Use o formato 000.000.000/0000-00."
+                    msg.text = "CNPJ inválido. Confira o formato 00.000.000/0000-00 e os dígitos verificadores."
                     return
                 if not validate_cep(cep.value):
                     msg.text = "CEP inválido. Use o formato 00000-000."
@@ -234,6 +317,10 @@ def settings_page(user):
                 if not validate_state(state.value):
                     msg.text = "UF inválido. Use dois caracteres."
                     return
+                address_error = check_address(cep.value, city.value, state.value)
+                if address_error:
+                    msg.text = address_error
+                    return
                 data = {
                     "company_name": name.value,
                     "company_CNPJ": cnpj.value,
@@ -243,15 +330,54 @@ def settings_page(user):
                     "company_address_city": city.value,
                     "company_address_state": state.value.upper(),
                 }
-                ok, feedback = add_company(data)
+                ok, feedback, company = await add_company(data)
                 if ok:
                     msg.text = ''
                     ui.notify(feedback, color='positive')
-                    refresh_table()
+                    insert_row(company)
                     name.value = cnpj.value = cep.value = number.value = additional.value = city.value = state.value = ''
                 else:
                     msg.text = feedback
 
             ui.button('Adicionar', on_click=submit).classes('mt-2')
 
+            # --- Importação em lote ---
+            ui.separator()
+            ui.label('Importar empresas (CSV/XLSX)').classes('text-lg font-bold mb-2 mt-8')
+            import_state = {'job': None}
+            import_status = ui.label()
+
+            def update_import_status():
+                job = import_state['job']
+                if job is None:
+                    return
+                import_status.text = job.summary()
+                if job.done:
+                    import_timer.active = False
+
+            import_timer = ui.timer(0.5, update_import_status, active=False)
+
+            async def handle_upload(e):
+                if import_state['job'] and not import_state['job'].done:
+                    ui.notify('Já existe uma importação em andamento', color='warning')
+                    return
+                job = ImportJob(e.name)
+                import_state['job'] = job
+                report_btn.visible = False
+                import_timer.active = True
+                await import_companies(e.name, e.content, job)
+                update_import_status()
+                if job.failed:
+                    ui.notify(f'Falha na importação: {job.failed}', color='negative')
+                else:
+                    ui.notify(f'Importação concluída: {job.summary()}', color='positive')
+                report_btn.visible = bool(job.errors)
+
+            ui.upload(on_upload=handle_upload, auto_upload=True, max_files=1).props('accept=.csv,.xlsx')
+            report_btn = ui.button(
+                'Baixar relatório de erros',
+                on_click=lambda: ui.download(error_report_csv(import_state['job']), 'erros_importacao.csv')
+            ).props('color=secondary')
+            report_btn.visible = False
+
     render_footer()
@@ -0,0 +1,128 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+# === Load environment variables ===
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "report_cache")
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+
+def cache_key(report_type, params, versions):
+    # versions maps each data slice the report reads to its current counter,
+    # so a write elsewhere never changes this key.
+    payload = json.dumps([report_type, params, versions], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_etag(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+class ReportCache:
+    # Size-bounded LRU of rendered artifacts on local disk. File names are
+    # "<key>.<etag>.<ext>" so the index can be rebuilt from the directory alone.
+    def __init__(self, directory=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            parts = name.split(".")
+            if len(parts) != 3:
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            files.append((stat.st_atime, parts[0], path, parts[1], stat.st_size))
+        for _, key, path, etag, size in sorted(files):
+            previous = self._entries.get(key)
+            if previous:
+                # Left over from before put() reused keys: keep the newest copy only.
+                self._size -= previous[2]
+                self._remove(previous[0])
+            self._entries[key] = (path, etag, size)
+            self._size += size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key) or self._discover(key)
+            if entry is None or not os.path.exists(entry[0]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def _discover(self, key):
+        # Another worker sharing the directory may have rendered it.
+        for path in glob.glob(os.path.join(self.directory, f"{key}.*.*")):
+            etag = os.path.basename(path).split(".")[1]
+            size = os.path.getsize(path)
+            self._entries[key] = (path, etag, size)
+            self._size += size
+            return self._entries[key]
+        return None
+
+    def put(self, key, source_path):
+        # The key covers the inputs, so an artifact already cached under it is
+        # the same report: keep that one (and its ETag) and drop the new render.
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing and os.path.exists(existing[0]):
+                self._entries.move_to_end(key)
+                self._remove(source_path)
+                return existing[0], existing[1]
+        etag = file_etag(source_path)
+        extension = os.path.splitext(source_path)[1].lstrip(".")
+        path = os.path.join(self.directory, f"{key}.{etag}.{extension}")
+        shutil.move(source_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._size -= previous[2]
+                if previous[0] != path:
+                    self._remove(previous[0])
+            self._entries[key] = (path, etag, size)
+            self._size += size
+            self._evict()
+        return path, etag
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        # Never evicts the entry that was just stored.
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, (path, _, size) = self._entries.popitem(last=False)
+            self._size -= size
+            self._remove(path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,110 @@
+import csv
+from reports import templates
+from utils.db import get_companies_collection
+from utils.repository import COMPANY_PROJECTION
+from utils.versions import ALL_COMPANIES, company_state_key
+
+COMPANY_COLUMNS = [
+    ("company_name", "Empresa"),
+    ("company_CNPJ", "CNPJ"),
+    ("company_address_CEP", "CEP"),
+    ("company_address_number", "Número"),
+    ("company_address_additional", "Complemento"),
+    ("company_address_city", "Cidade"),
+    ("company_address_state", "UF"),
+]
+PROGRESS_EVERY = 500
+
+
+def companies_query(params):
+    query = {}
+    if params.get("state"):
+        query["company_address_state"] = params["state"].upper()
+    return query
+
+
+def companies_dependencies(params):
+    # The data slices a report reads; its cache entry is keyed on their versions.
+    if params.get("state"):
+        return [company_state_key(params["state"])]
+    return [ALL_COMPANIES]
+
+
+def iter_company_rows(job):
+    # Yields one list of cell values per company while reporting progress on the job.
+    collection = get_companies_collection()
+    query = companies_query(job.params)
+    total = collection.count_documents(query) or 1
+    cursor = collection.find(query, COMPANY_PROJECTION).sort("company_name", 1).batch_size(1000)
+    for i, company in enumerate(cursor, start=1):
+        yield [str(company.get(field) or "") for field, _ in COMPANY_COLUMNS]
+        if i % PROGRESS_EVERY == 0:
+            job.raise_if_cancelled()
+            job.set_progress(i / total)
+
+
+def companies_report(job, path):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow([label for _, label in COMPANY_COLUMNS])
+        writer.writerows(iter_company_rows(job))
+
+
+def companies_xlsx_report(job, path):
+    from openpyxl import Workbook
+    # write_only streams rows to a temporary file instead of keeping cells in memory.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Empresas")
+    sheet.append([label for _, label in COMPANY_COLUMNS])
+    for row in iter_company_rows(job):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def companies_pdf_report(job, path):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen.canvas import Canvas
+    font = templates.font_name()
+    width, height = landscape(A4)
+    usable = width - 2 * templates.PDF_MARGIN
+    total_weight = sum(templates.PDF_COLUMN_WEIGHTS)
+    offsets = [templates.PDF_MARGIN]
+    for weight in templates.PDF_COLUMN_WEIGHTS[:-1]:
+        offsets.append(offsets[-1] + usable * weight / total_weight)
+    canvas = Canvas(path, pagesize=(width, height), pageCompression=1)
+
+    def start_page():
+        canvas.setFont(font, templates.PDF_FONT_SIZE + 2)
+        canvas.drawString(templates.PDF_MARGIN, height - templates.PDF_MARGIN, "Empresas cadastradas")
+        canvas.setFont(font, templates.PDF_FONT_SIZE)
+        y = height - templates.PDF_MARGIN - 2 * templates.PDF_ROW_HEIGHT
+        for x, (_, label) in zip(offsets, COMPANY_COLUMNS):
+            canvas.drawString(x, y, label)
+        return y - templates.PDF_ROW_HEIGHT
+
+    y = start_page()
+    for row in iter_company_rows(job):
+        if y < templates.PDF_MARGIN:
+            canvas.showPage()
+            y = start_page()
+        for x, value in zip(offsets, row):
+            canvas.drawString(x, y, value[:48])
+        y -= templates.PDF_ROW_HEIGHT
+    canvas.save()
+
+
+# "process": True sends the build to the render process pool instead of a thread.
+REPORT_TYPES = {
+    "companies": {
+        "label": "Empresas cadastradas (CSV)", "extension": "csv",
+        "build": companies_report, "depends": companies_dependencies,
+    },
+    "companies_xlsx": {
+        "label": "Empresas cadastradas (XLSX)", "extension": "xlsx",
+        "build": companies_xlsx_report, "depends": companies_dependencies, "process": True,
+    },
+    "companies_pdf": {
+        "label": "Empresas cadastradas (PDF)", "extension": "pdf",
+        "build": companies_pdf_report, "depends": companies_dependencies, "process": True,
+    },
+}
@@ -0,0 +1,411 @@
+import asyncio
+import os
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from reports.cache import ReportCache, cache_key, file_etag
+from reports.definitions import REPORT_TYPES
+from reports.render import REPORT_RENDER_PROCESSES, RenderCancelled, render_in_process
+from utils.db import get_client, MONGO_DB
+from utils.repository import run_db
+from utils.versions import get_versions
+
+# === Load environment variables ===
+# One report thread per render process by default; fewer would leave warm
+# render processes idle, more would only queue inside the pool.
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", str(REPORT_RENDER_PROCESSES)))
+REPORT_MAX_JOBS_PER_USER = int(os.getenv("REPORT_MAX_JOBS_PER_USER", "2"))
+REPORT_DIR = os.getenv("REPORT_DIR", "report_artifacts")
+REPORT_QUEUE_BACKEND = os.getenv("REPORT_QUEUE_BACKEND", "memory")
+REPORT_JOBS_COLLECTION = os.getenv("MONGODB_REPORT_JOBS_COLLECTION", "report_jobs")
+REPORT_HISTORY_PER_USER = 20
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "1") == "1"
+# A running job's lease is renewed every third of this; once it lapses the
+# job is assumed orphaned (its worker died) and is queued again.
+REPORT_JOB_LEASE_SECONDS = int(os.getenv("REPORT_JOB_LEASE_SECONDS", "60"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, owner, report_type, params, id=None, status=QUEUED, created=None):
+        self.id = id or uuid.uuid4().hex
+        self.owner = owner
+        self.report_type = report_type
+        self.params = params
+        self.status = status
+        self.progress = 0.0
+        self.error = None
+        self.created = created or datetime.utcnow()
+        self.finished = None
+        self.artifact = None
+        self.etag = None
+        self.cache_key = None
+        self._cancel = threading.Event()
+        self._on_change = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def label(self):
+        return REPORT_TYPES[self.report_type]["label"]
+
+    def set_progress(self, progress):
+        self.progress = min(1.0, max(0.0, progress))
+        if self._on_change:
+            self._on_change(self)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def to_document(self):
+        return {
+            "_id": self.id,
+            "owner": self.owner,
+            "report_type": self.report_type,
+            "params": self.params,
+            "status": self.status,
+            "error": self.error,
+            "artifact": self.artifact,
+            "etag": self.etag,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+    @classmethod
+    def from_document(cls, doc):
+        job = cls(doc["owner"], doc["report_type"], doc.get("params", {}),
+                  id=doc["_id"], status=doc["status"], created=doc.get("created"))
+        job.error = doc.get("error")
+        job.artifact = doc.get("artifact")
+        job.etag = doc.get("etag")
+        job.finished = doc.get("finished")
+        return job
+
+# === Job Stores ===
+
+class MemoryJobStore:
+    def save(self, job):
+        pass
+
+    def load_pending(self):
+        return []
+
+    def claim(self, job):
+        return True
+
+    def renew(self, job):
+        return True
+
+    def requeue_expired(self):
+        return []
+
+    def get(self, job_id):
+        return None
+
+    def count_active(self, owner):
+        return None
+
+
+class MongoJobStore:
+    # Durable queue: jobs survive restarts and a job is only run by the
+    # process that atomically claims it. The claim is a lease the running
+    # worker keeps renewing, so only jobs of dead workers are ever requeued.
+    def __init__(self, lease_seconds=REPORT_JOB_LEASE_SECONDS):
+        self.worker_id = uuid.uuid4().hex
+        self.lease = timedelta(seconds=lease_seconds)
+
+    @property
+    def collection(self):
+        # Resolved per call so building the queue at import opens no client.
+        return get_client()[MONGO_DB][REPORT_JOBS_COLLECTION]
+
+    def save(self, job):
+        self.collection.replace_one({"_id": job.id}, job.to_document(), upsert=True)
+
+    def load_pending(self):
+        self.collection.create_index([("status", ASCENDING), ("created", ASCENDING)])
+        self.requeue_expired()
+        docs = self.collection.find({"status": QUEUED}).sort("created", ASCENDING)
+        return [Job.from_document(doc) for doc in docs]
+
+    def requeue_expired(self):
+        # Running jobs whose lease lapsed (or that predate leases) go back in the queue.
+        expired = {"status": RUNNING, "$or": [
+            {"lease_until": {"$lt": datetime.utcnow()}},
+            {"lease_until": {"$exists": False}},
+        ]}
+        ids = [doc["_id"] for doc in self.collection.find(expired, {"_id": 1})]
+        requeued = []
+        for job_id in ids:
+            doc = self.collection.find_one_and_update(
+                dict(expired, _id=job_id),
+                {"$set": {"status": QUEUED}, "$unset": {"worker": "", "lease_until": ""}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc:
+                requeued.append(Job.from_document(doc))
+        return requeued
+
+    def claim(self, job):
+        result = self.collection.update_one(
+            {"_id": job.id, "status": QUEUED},
+            {"$set": {"status": RUNNING, "worker": self.worker_id,
+                      "lease_until": datetime.utcnow() + self.lease}},
+        )
+        return result.modified_count == 1
+
+    def renew(self, job):
+        result = self.collection.update_one(
+            {"_id": job.id, "status": RUNNING, "worker": self.worker_id},
+            {"$set": {"lease_until": datetime.utcnow() + self.lease}},
+        )
+        return result.modified_count == 1
+
+    def get(self, job_id):
+        doc = self.collection.find_one({"_id": job_id})
+        return Job.from_document(doc) if doc else None
+
+    def count_active(self, owner):
+        return self.collection.count_documents({"owner": owner, "status": {"$in": list(ACTIVE_STATUSES)}})
+
+# === Queue ===
+
+class ReportQueue:
+    def __init__(self, store, workers=REPORT_WORKERS, per_user_limit=REPORT_MAX_JOBS_PER_USER,
+                 artifact_dir=REPORT_DIR, cache=None):
+        self.store = store
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.artifact_dir = artifact_dir
+        self.cache = cache
+        self._jobs = {}
+        self._subscribers = defaultdict(set)
+        self._queue = None
+        self._loop = None
+        self._tasks = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._requeue_orphans()))
+
+    async def load_pending(self):
+        # Run as a startup step once Mongo is up; raises so the step retries.
+        for job in await run_db(self.store.load_pending):
+            if job.id not in self._jobs:
+                self._track(job)
+                self._queue.put_nowait(job)
+
+    async def stop(self):
+        for job in self._jobs.values():
+            job._cancel.set()
+        for task in self._tasks:
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _track(self, job):
+        job._on_change = self._changed_from_thread
+        self._jobs[job.id] = job
+
+    async def submit(self, owner, report_type, params):
+        if report_type not in REPORT_TYPES:
+            return None, "Tipo de relatório desconhecido."
+        key = None
+        if self.cache is not None:
+            versions = await run_db(get_versions, REPORT_TYPES[report_type]["depends"](params))
+            key = cache_key(report_type, params, versions)
+            cached = self.cache.get(key)
+            if cached:
+                return await self._submit_cached(owner, report_type, params, cached), None
+        # The durable store counts jobs across all workers; memory only sees this one.
+        active = await run_db(self.store.count_active, owner)
+        if active is None:
+            active = sum(1 for job in self.jobs_for(owner) if job.active)
+        if active >= self.per_user_limit:
+            return None, f"Limite de {self.per_user_limit} relatórios em andamento atingido."
+        job = Job(owner, report_type, params)
+        job.cache_key = key
+        self._track(job)
+        self._prune(owner)
+        # Saved before queueing so a durable store can be claimed against it.
+        await run_db(self.store.save, job)
+        self._queue.put_nowait(job)
+        self._notify(job)
+        return job, None
+
+    async def _submit_cached(self, owner, report_type, params, cached):
+        # Same report over unchanged data: answered without rendering.
+        job = Job(owner, report_type, params, status=DONE)
+        job.artifact, job.etag = cached
+        job.progress = 1.0
+        job.finished = datetime.utcnow()
+        self._track(job)
+        self._prune(owner)
+        await run_db(self.store.save, job)
+        self._notify(job)
+        return job
+
+    def cancel(self, job_id, owner):
+        job = self._jobs.get(job_id)
+        if not job or job.owner != owner or not job.active:
+            return False
+        job._cancel.set()
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED)
+        return True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def find(self, job_id):
+        # Falls back to the durable store for jobs submitted through another worker.
+        return self._jobs.get(job_id) or await run_db(self.store.get, job_id)
+
+    def jobs_for(self, owner):
+        jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created, reverse=True)
+
+    def subscribe(self, owner, callback):
+        self._subscribers[owner].add(callback)
+        return lambda: self._subscribers[owner].discard(callback)
+
+    def stats(self):
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "workers": self.workers,
+        }
+
+    def artifact_path(self, job):
+        extension = REPORT_TYPES[job.report_type]["extension"]
+        return os.path.join(self.artifact_dir, f"{job.id}.{extension}")
+
+    def _prune(self, owner):
+        finished = [job for job in self.jobs_for(owner) if not job.active]
+        for job in finished[REPORT_HISTORY_PER_USER:]:
+            del self._jobs[job.id]
+
+    def _persist(self, job):
+        asyncio.ensure_future(run_db(self.store.save, job))
+
+    def _notify(self, job):
+        for callback in list(self._subscribers.get(job.owner, ())):
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"[REPORT] Subscriber failed: {e}")
+
+    def _changed_from_thread(self, job):
+        self._loop.call_soon_threadsafe(self._notify, job)
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished = datetime.utcnow()
+        self._persist(job)
+        self._notify(job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue
+                claimed = await run_db(self.store.claim, job)
+                if not claimed:
+                    await self._release(job)
+                    continue
+                job.status = RUNNING
+                self._notify(job)
+                heartbeat = asyncio.create_task(self._keep_lease(job))
+                try:
+                    await self._loop.run_in_executor(self._executor, self._run_job, job)
+                    self._finish(job, DONE)
+                except JobCancelled:
+                    self._finish(job, CANCELLED)
+                except Exception as e:
+                    print(f"[REPORT] Job {job.id} failed: {e}")
+                    self._finish(job, FAILED, str(e))
+                finally:
+                    heartbeat.cancel()
+            finally:
+                self._queue.task_done()
+
+    async def _release(self, job):
+        # Another worker claimed the job. Forget the local copy so find() reads
+        # the store from now on, and let open pages refresh with the stored state.
+        self._jobs.pop(job.id, None)
+        current = await run_db(self.store.get, job.id)
+        self._notify(current or job)
+
+    async def _keep_lease(self, job):
+        while True:
+            await asyncio.sleep(REPORT_JOB_LEASE_SECONDS / 3)
+            try:
+                await run_db(self.store.renew, job)
+            except Exception as e:
+                print(f"[REPORT] Could not renew lease of job {job.id}: {e}")
+
+    async def _requeue_orphans(self):
+        # Picks up jobs whose worker died while rendering them.
+        while True:
+            await asyncio.sleep(REPORT_JOB_LEASE_SECONDS)
+            try:
+                for job in await run_db(self.store.requeue_expired):
+                    self._track(job)
+                    self._queue.put_nowait(job)
+            except Exception as e:
+                print(f"[REPORT] Orphaned job sweep failed: {e}")
+
+    def _run_job(self, job):
+        # Runs on the report thread pool, never on the event loop.
+        job.raise_if_cancelled()
+        path = self.artifact_path(job)
+        definition = REPORT_TYPES[job.report_type]
+        try:
+            if definition.get("process"):
+                try:
+                    render_in_process(job, path)
+                except RenderCancelled:
+                    raise JobCancelled()
+            else:
+                definition["build"](job, path)
+            job.raise_if_cancelled()
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        if self.cache is not None and job.cache_key:
+            job.artifact, job.etag = self.cache.put(job.cache_key, path)
+        else:
+            job.artifact, job.etag = path, file_etag(path)
+        job.set_progress(1.0)
+
+
+def create_report_queue():
+    store = MongoJobStore() if REPORT_QUEUE_BACKEND == "mongo" else MemoryJobStore()
+    cache = ReportCache() if REPORT_CACHE_ENABLED else None
+    return ReportQueue(store, cache=cache)
+
+
+report_queue = create_report_queue()
@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from reports import templates
+from reports.definitions import REPORT_TYPES
+
+# === Load environment variables ===
+REPORT_RENDER_PROCESSES = int(os.getenv("REPORT_RENDER_PROCESSES", str(os.cpu_count() or 1)))
+PROGRESS_POLL_SECONDS = 0.5
+
+# Spawn, not fork: the parent holds a MongoClient and event-loop threads that must not be copied.
+_context = multiprocessing.get_context("spawn")
+_pool = None
+_manager = None
+_shared = None
+_lock = threading.Lock()
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+class WorkerJob:
+    # Stand-in for reports.jobs.Job inside a render process; progress and
+    # cancellation travel through manager dicts keyed by job id.
+    def __init__(self, job_id, params, progress, cancelled):
+        self.id = job_id
+        self.params = params
+        self._progress = progress
+        self._cancelled = cancelled
+
+    def set_progress(self, progress):
+        self._progress[self.id] = progress
+
+    def raise_if_cancelled(self):
+        if self._cancelled.get(self.id):
+            raise RenderCancelled()
+
+
+def _init_worker():
+    templates.preload()
+
+
+def _warm():
+    return os.getpid()
+
+
+def _render(report_type, job_id, params, path, progress, cancelled):
+    # Only the report type, ids and query parameters cross the process boundary;
+    # the worker reads Mongo itself and writes the artifact straight to disk.
+    job = WorkerJob(job_id, params, progress, cancelled)
+    REPORT_TYPES[report_type]["build"](job, path)
+    return path
+
+
+def get_pool():
+    global _pool, _manager, _shared
+    with _lock:
+        if _pool is None:
+            _manager = _context.Manager()
+            _shared = (_manager.dict(), _manager.dict())
+            _pool = ProcessPoolExecutor(
+                max_workers=REPORT_RENDER_PROCESSES,
+                mp_context=_context,
+                initializer=_init_worker,
+            )
+    return _pool
+
+
+def warm_up():
+    # Starts every worker now so templates and fonts are loaded before the first request.
+    pool = get_pool()
+    futures = [pool.submit(_warm) for _ in range(REPORT_RENDER_PROCESSES)]
+    return sorted({future.result() for future in futures})
+
+
+def render_in_process(job, path):
+    # Called from a report thread; blocks it (not the event loop) until the worker finishes.
+    pool = get_pool()
+    progress, cancelled = _shared
+    future = pool.submit(_render, job.report_type, job.id, job.params, path, progress, cancelled)
+    try:
+        while not future.done():
+            time.sleep(PROGRESS_POLL_SECONDS)
+            if job.cancel_requested:
+                cancelled[job.id] = True
+            if job.id in progress:
+                job.set_progress(progress[job.id])
+        return future.result()
+    finally:
+        progress.pop(job.id, None)
+        cancelled.pop(job.id, None)
+
+
+def shutdown():
+    global _pool, _manager
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _manager.shutdown()
+            _pool = _manager = None
@@ -0,0 +1,39 @@
+import os
+
+# === Load environment variables ===
+REPORT_FONT_PATH = os.getenv("REPORT_FONT_PATH")
+REPORT_FONT_NAME = "ReportFont"
+
+PDF_FONT_SIZE = 8
+PDF_MARGIN = 36
+PDF_ROW_HEIGHT = 12
+# Relative widths of the company columns on a landscape A4 page.
+PDF_COLUMN_WEIGHTS = [4, 2.2, 1.3, 1, 2, 2, 0.6]
+
+_loaded = {}
+
+
+def preload():
+    # Called once per render worker so the first job does not pay for imports and font parsing.
+    for loader in (font_name, _load_openpyxl):
+        try:
+            loader()
+        except ImportError as e:
+            print(f"[REPORT] Render worker could not preload: {e}")
+
+
+def _load_openpyxl():
+    import openpyxl  # noqa: F401
+
+
+def font_name():
+    if "font" not in _loaded:
+        if REPORT_FONT_PATH:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+            pdfmetrics.registerFont(TTFont(REPORT_FONT_NAME, REPORT_FONT_PATH))
+            _loaded["font"] = REPORT_FONT_NAME
+        else:
+            import reportlab.pdfgen.canvas  # noqa: F401
+            _loaded["font"] = "Helvetica"
+    return _loaded["font"]
@@ -0,0 +1,66 @@
+import os
+import signal
+import subprocess
+import sys
+
+# === Production entry point ===
+# NiceGUI keeps each browser tab's state in the process that rendered the page,
+# so the page request and its websocket must reach the same worker. Instead of
+# sharing one port between workers (gunicorn-style), every worker gets its own
+# port and a sticky proxy in front routes each user to one of them; see
+# deploy/nginx.conf and the README.
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+BASE_PORT = int(os.getenv("PORT", "8080"))
+
+
+def worker_env(index):
+    env = dict(os.environ)
+    env["PORT"] = str(BASE_PORT + index)
+    env["WORKER_INDEX"] = str(index)
+    env["NICEGUI_RELOAD"] = "0"
+    # Each worker has its own render pool; split the cores between them instead
+    # of every worker spawning cpu_count processes.
+    env.setdefault("REPORT_RENDER_PROCESSES", str(max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+    # Several workers only make sense with cross-worker coordination.
+    if WEB_WORKERS > 1:
+        env.setdefault("SHARED_STATE_BACKEND", "mongo")
+        env.setdefault("REPORT_QUEUE_BACKEND", "mongo")
+    return env
+
+
+def main():
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    workers = [
+        subprocess.Popen([sys.executable, main_py], env=worker_env(i))
+        for i in range(WEB_WORKERS)
+    ]
+    print(f"[SERVE] {WEB_WORKERS} workers on ports {BASE_PORT}-{BASE_PORT + WEB_WORKERS - 1}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for worker in workers:
+            worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    # If any worker dies the supervisor exits too, so the orchestrator restarts the set.
+    exit_code = 0
+    try:
+        while workers:
+            pid, status = os.wait()
+            exited = [w for w in workers if w.pid == pid]
+            workers = [w for w in workers if w.pid != pid]
+            # Exits caused by our own terminate() are a normal shutdown.
+            if exited and status != 0 and not stopping:
+                exit_code = 1
+                stop(None, None)
+    except ChildProcessError:
+        pass
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
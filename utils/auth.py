@@ -1,49 +1,164 @@
+import asyncio
 import os
+import time
+import uuid
 from datetime import datetime, timedelta
-from authlib.integrations.starlette_client import OAuth
-from pymongo import MongoClient
 import jwt
+from utils.cache import TTLCache
+from utils.oauth_metadata import google_metadata
+from utils.shared import bus
+from utils.db import get_client, MONGO_USERS_DB
+from utils.repository import find_user_by_email, run_db
 
 # === Load environment variables ===
 APP_STORAGE_SECRET = os.getenv("APP_STORAGE_SECRET")
 JWT_TOKEN_KEY = 'ats_jwt_token'
-JWT_TOKEN_LIFETIME = timedelta(days=7)
+JWT_TOKEN_LIFETIME = timedelta(seconds=int(os.getenv("JWT_TOKEN_LIFETIME_SECONDS", str(7 * 24 * 3600))))
+JWT_REFRESH_AFTER = timedelta(seconds=int(os.getenv("JWT_REFRESH_AFTER_SECONDS", str(24 * 3600))))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "60"))
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+REVOKED_SESSIONS_COLLECTION = "revoked_sessions"
 BASE_URL = os.getenv("BASE_URL")
-MONGO_URI = os.getenv("MONGO_URI")
-
-# === MongoDB Setup ===
-try:
-    mongo_client = MongoClient(MONGO_URI)
-    db = mongo_client["ats_db"]
-    users_collection = db["users"]
-    mongo_client.admin.command('ping')
-except Exception as e:
-    print(f"[DB] Connection failed: {e}")
-    import sys
-    sys.exit(1)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+# === User Cache ===
+# Keyed by email; entries must be invalidated whenever a user document changes.
+# Only tokens issued before the display claims existed still read it.
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def invalidate_user(email):
+    # Published so every worker drops its copy, not just this one.
+    bus.publish("user_invalidated", email)
+
+bus.subscribe("user_invalidated", user_cache.invalidate)
 
 # === OAuth Setup ===
-oauth = OAuth()
-oauth.register(
-    "google",
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid email profile"},
-)
+# Registered on first use (normally by a startup step) rather than at import:
+# authlib pulls in httpx and cryptography, which every worker start paid for.
+_oauth = None
+
+def get_oauth():
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+        oauth = OAuth()
+        oauth.register(
+            "google",
+            client_id=os.getenv("GOOGLE_CLIENT_ID"),
+            client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+            server_metadata_url=google_metadata.url,
+            client_kwargs={"scope": "openid email profile"},
+        )
+        _oauth = oauth
+    return _oauth
+
+# === Session Tokens ===
+# Tokens carry the claims the pages need (email, name, picture) plus a session
+# id, so an authenticated navigation needs neither a DB call nor, thanks to
+# the verified-token cache, a signature check.
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+revoked_sessions = set()
+
+def create_session_token(user, sid=None):
+    now = datetime.utcnow()
+    return jwt.encode({
+        "email": user["email"],
+        "name": user.get("name"),
+        "picture": user.get("picture"),
+        "sid": sid or uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + JWT_TOKEN_LIFETIME,
+    }, APP_STORAGE_SECRET, algorithm="HS256")
+
+def set_session_cookie(response, token):
+    response.set_cookie(key=JWT_TOKEN_KEY, value=token, httponly=True, max_age=int(JWT_TOKEN_LIFETIME.total_seconds()))
 
 def decode_jwt_token(token: str):
-    try:
-        return jwt.decode(token, APP_STORAGE_SECRET, algorithms=["HS256"])
-    except Exception:
+    data = token_cache.get(token)
+    if data is None:
+        try:
+            data = jwt.decode(token, APP_STORAGE_SECRET, algorithms=["HS256"])
+        except Exception:
+            return None
+        token_cache.set(token, data)
+    if data["exp"] <= time.time():
+        token_cache.invalidate(token)
+        return None
+    if data.get("sid") in revoked_sessions:
         return None
+    return data
+
+def session_needs_refresh(data):
+    return time.time() - data.get("iat", 0) > JWT_REFRESH_AFTER.total_seconds()
+
+# === Session Revocation ===
+# Revoked session ids live in Mongo until their token would have expired anyway;
+# every process keeps an in-memory copy that is resynced periodically.
+
+def get_revoked_sessions_collection():
+    return get_client()[MONGO_USERS_DB][REVOKED_SESSIONS_COLLECTION]
+
+def _store_revocation(sid, expires):
+    get_revoked_sessions_collection().update_one({"_id": sid}, {"$set": {"exp": expires}}, upsert=True)
+
+def _load_revocations():
+    collection = get_revoked_sessions_collection()
+    collection.create_index("exp", expireAfterSeconds=0)
+    return {doc["_id"] for doc in collection.find({"exp": {"$gt": datetime.utcnow()}}, {"_id": 1})}
+
+def revocation_expiry():
+    # A refresh reissues the session with a fresh exp, possibly on another
+    # worker just before the logout, so the token being revoked is not
+    # necessarily the longest-lived one.
+    return datetime.utcnow() + JWT_TOKEN_LIFETIME + JWT_REFRESH_AFTER
+
+async def revoke_session(data):
+    sid = data.get("sid")
+    if not sid:
+        return
+    bus.publish("session_revoked", sid)
+    await run_db(_store_revocation, sid, revocation_expiry())
+
+# Revocations seen on the bus but possibly not yet in Mongo; kept until a
+# sync returns them (or they expire) so a resync never un-revokes a session.
+pending_revocations = {}
+
+def remember_revocation(sid):
+    pending_revocations[sid] = revocation_expiry()
+    revoked_sessions.add(sid)
+
+bus.subscribe("session_revoked", remember_revocation)
+
+async def revocation_sync():
+    while True:
+        try:
+            current = await run_db(_load_revocations)
+            now = datetime.utcnow()
+            for sid, expires in list(pending_revocations.items()):
+                if sid in current or expires <= now:
+                    del pending_revocations[sid]
+            revoked_sessions.clear()
+            revoked_sessions.update(current, pending_revocations)
+        except Exception as e:
+            print(f"[AUTH] Revocation sync failed: {e}")
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
 
-def get_current_user(request):
+async def get_current_user(request):
     token = request.cookies.get(JWT_TOKEN_KEY)
     if not token:
         return None
     data = decode_jwt_token(token)
     if not data:
         return None
-    user = users_collection.find_one({"email": data["email"]})
-    return user
\ No newline at end of file
+    if data.get("name"):
+        return {"email": data["email"], "name": data["name"], "picture": data.get("picture")}
+    # Tokens issued before the display claims existed still need a lookup.
+    email = data["email"]
+    user = user_cache.get(email)
+    if user is None:
+        user = await find_user_by_email(email)
+        if user:
+            user_cache.set(email, user)
+    return user
@@ -0,0 +1,212 @@
+import asyncio
+import csv
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from utils.db import get_companies_collection
+from utils.search import search_fields
+from utils.versions import bump, company_version_keys
+from utils.validation import format_cnpj, validate_cnpjs, validate_ceps, validate_states
+from utils.cep import check_addresses
+
+# === Load environment variables ===
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+# Imports run for the whole file, so they get their own threads instead of
+# holding slots of the shared DB executor that page queries need.
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+
+DUPLICATE_KEY = 11000
+COMPANY_FIELDS = (
+    "company_name",
+    "company_CNPJ",
+    "company_address_CEP",
+    "company_address_number",
+    "company_address_additional",
+    "company_address_city",
+    "company_address_state",
+)
+# Spreadsheet cells typed as numbers lose their leading zeros; restored to this many digits.
+NUMERIC_WIDTHS = {"company_CNPJ": 14, "company_address_CEP": 8}
+REQUIRED_FIELDS = ("company_name", "company_CNPJ", "company_address_CEP", "company_address_city", "company_address_state")
+
+# Headers may use the field names or the labels shown in the settings table.
+HEADER_ALIASES = {field.lower(): field for field in COMPANY_FIELDS}
+HEADER_ALIASES.update({
+    "empresa": "company_name",
+    "nome da empresa": "company_name",
+    "cnpj": "company_CNPJ",
+    "cep": "company_address_CEP",
+    "número": "company_address_number",
+    "numero": "company_address_number",
+    "complemento": "company_address_additional",
+    "cidade": "company_address_city",
+    "uf": "company_address_state",
+})
+
+
+class ImportJob:
+    # Progress is written by the import thread and read by the UI timer.
+    def __init__(self, filename):
+        self.filename = filename
+        self.processed = 0
+        self.inserted = 0
+        self.errors = []
+        self.done = False
+        self.failed = None
+        self._lock = threading.Lock()
+
+    def add_error(self, line, cnpj, message):
+        with self._lock:
+            self.errors.append((line, cnpj, message))
+
+    def summary(self):
+        return f"{self.processed} linhas lidas, {self.inserted} inseridas, {len(self.errors)} com erro"
+
+# === Parsing ===
+
+def _map_header(header):
+    return [HEADER_ALIASES.get(str(h or "").strip().lower()) for h in header]
+
+
+def iter_csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    fields = _map_header(next(reader, []))
+    for line, values in enumerate(reader, start=2):
+        yield line, {f: v for f, v in zip(fields, values) if f}
+
+
+def iter_xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Importação de XLSX requer o pacote openpyxl.")
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        fields = _map_header(next(rows, []))
+        for line, values in enumerate(rows, start=2):
+            yield line, {f: v for f, v in zip(fields, values) if f}
+    finally:
+        workbook.close()
+
+
+def iter_rows(filename, fileobj):
+    if filename.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(fileobj)
+    return iter_csv_rows(fileobj)
+
+
+def cell_text(field, value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool) and field in NUMERIC_WIDTHS:
+        digits = f"{value:0{NUMERIC_WIDTHS[field]}d}"
+        return f"{digits[:5]}-{digits[5:]}" if field == "company_address_CEP" else digits
+    return str(value or "").strip()
+
+
+def validate_rows(rows):
+    # Validates a whole chunk column by column; returns (data, error) per row.
+    datas = [{field: cell_text(field, row.get(field)) for field in COMPANY_FIELDS} for row in rows]
+    cnpj_ok = validate_cnpjs(data["company_CNPJ"] for data in datas)
+    cep_ok = validate_ceps(data["company_address_CEP"] for data in datas)
+    state_ok = validate_states(data["company_address_state"] for data in datas)
+    # One sorted pass over the CEP index for the whole chunk.
+    address_errors = check_addresses(
+        (data["company_address_CEP"], data["company_address_city"], data["company_address_state"]) for data in datas
+    )
+    results = []
+    for data, cnpj, cep, state, address_error in zip(datas, cnpj_ok, cep_ok, state_ok, address_errors):
+        if not all(data[field] for field in REQUIRED_FIELDS):
+            results.append((None, "Preencha todos os campos obrigatórios."))
+        elif not cnpj:
+            results.append((None, "CNPJ inválido."))
+        elif not cep:
+            results.append((None, "CEP inválido."))
+        elif not state:
+            results.append((None, "UF inválido."))
+        elif address_error:
+            results.append((None, address_error))
+        else:
+            data["company_CNPJ"] = format_cnpj(data["company_CNPJ"])
+            data["company_address_state"] = data["company_address_state"].upper()
+            data["version"] = 0
+            data.update(search_fields(data))
+            results.append((data, None))
+    return results
+
+# === Import ===
+
+def _write_batch(collection, batch, job):
+    # Unordered so one duplicate does not stop the rest; the unique CNPJ index does the dedup.
+    try:
+        result = collection.bulk_write([InsertOne(data) for _, data in batch], ordered=False)
+        job.inserted += result.inserted_count
+    except BulkWriteError as e:
+        job.inserted += e.details.get("nInserted", 0)
+        for error in e.details.get("writeErrors", []):
+            line, data = batch[error["index"]]
+            if error.get("code") == DUPLICATE_KEY:
+                message = "Empresa com este CNPJ já existe."
+            else:
+                message = error.get("errmsg", "Erro ao inserir empresa.")
+            job.add_error(line, data["company_CNPJ"], message)
+    bump(company_version_keys(*(data for _, data in batch)))
+
+
+def _import_chunk(collection, chunk, job):
+    batch = []
+    for (line, row), (data, error) in zip(chunk, validate_rows(row for _, row in chunk)):
+        if error:
+            job.add_error(line, str(row.get("company_CNPJ") or ""), error)
+        else:
+            batch.append((line, data))
+    if batch:
+        _write_batch(collection, batch, job)
+
+
+def run_import(filename, fileobj, job, batch_size=IMPORT_BATCH_SIZE):
+    collection = get_companies_collection()
+    chunk = []
+    try:
+        for line, row in iter_rows(filename, fileobj):
+            job.processed += 1
+            chunk.append((line, row))
+            if len(chunk) >= batch_size:
+                _import_chunk(collection, chunk, job)
+                chunk = []
+        if chunk:
+            _import_chunk(collection, chunk, job)
+    except Exception as e:
+        job.failed = str(e)
+    finally:
+        job.done = True
+    return job
+
+
+def error_report_csv(job):
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=";")
+    writer.writerow(["linha", "cnpj", "erro"])
+    writer.writerows(sorted(job.errors))
+    return out.getvalue().encode("utf-8-sig")
+
+
+async def import_companies(filename, fileobj, job):
+    return await asyncio.get_running_loop().run_in_executor(_executor, run_import, filename, fileobj, job)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,230 @@
+import csv
+import io
+import mmap
+import os
+import struct
+import sys
+import threading
+from utils.cache import TTLCache
+from utils.search import fold
+
+try:
+    import numpy as np
+except ImportError:  # optional: batches fall back to per-CEP lookups
+    np = None
+
+# === Load environment variables ===
+CEP_INDEX_PATH = os.getenv("CEP_INDEX_PATH", "data/cep_index.bin")
+CEP_CACHE_SIZE = int(os.getenv("CEP_CACHE_SIZE", "20000"))
+
+# === Index Format ===
+# Built offline from a CEP range table (see build_index). Layout:
+#   header   MAGIC, range count, place count, places offset
+#   ranges   sorted, non-overlapping (start, end, place) uint32 triples
+#   places   "city\tUF\n" per place, UTF-8
+# Ranges are binary-searched in place through mmap; only the small place
+# table is decoded into memory.
+MAGIC = b"CEPIDX01"
+HEADER = struct.Struct("<8sIIQ")
+RANGE = struct.Struct("<III")
+
+_NOT_FOUND = ()
+
+
+def cep_number(cep):
+    digits = "".join(c for c in str(cep) if c.isascii() and c.isdigit())
+    return int(digits) if len(digits) == 8 else None
+
+
+class CepIndex:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, place_count, places_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a CEP index")
+        places = self._map[places_offset:].decode("utf-8").split("\n")[:place_count]
+        self.places = [tuple(place.split("\t")) for place in places]
+
+    def _range(self, i):
+        return RANGE.unpack_from(self._map, HEADER.size + i * RANGE.size)
+
+    def lookup_number(self, number):
+        # Last range starting at or before the CEP, then a bounds check.
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._range(mid)[0] <= number:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+        start, end, place = self._range(lo - 1)
+        return self.places[place] if number <= end else None
+
+    def lookup_numbers(self, numbers):
+        # numbers must be sorted; one searchsorted over the mapped start column.
+        if np is None or not self.count:
+            return [self.lookup_number(n) for n in numbers]
+        table = np.frombuffer(self._map, dtype=np.uint32, count=self.count * 3, offset=HEADER.size)
+        table = table.reshape(-1, 3)
+        wanted = np.asarray(numbers, dtype=np.int64)
+        positions = np.searchsorted(table[:, 0], wanted, side="right") - 1
+        found = positions >= 0
+        positions = np.where(found, positions, 0)
+        found &= wanted <= table[positions, 1]
+        return [
+            self.places[place] if hit else None
+            for place, hit in zip(table[positions, 2].tolist(), found.tolist())
+        ]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class CepService:
+    # Opened on first use; without an index file lookups return None and
+    # address checks are skipped rather than rejecting every CEP.
+    def __init__(self, path=CEP_INDEX_PATH, cache_size=CEP_CACHE_SIZE):
+        self.path = path
+        self.cache = TTLCache(maxsize=cache_size, ttl=float("inf"))
+        self._index = None
+        self._lock = threading.Lock()
+        self._missing = False
+
+    @property
+    def index(self):
+        if self._index is None and not self._missing:
+            with self._lock:
+                if self._index is None and not self._missing:
+                    if os.path.exists(self.path):
+                        self._index = CepIndex(self.path)
+                        print(f"[CEP] Loaded {self._index.count} ranges from {self.path}")
+                    else:
+                        self._missing = True
+                        print(f"[CEP] No index at {self.path}; CEP lookups disabled")
+        return self._index
+
+    @property
+    def available(self):
+        return self.index is not None
+
+    def lookup(self, cep):
+        # Returns (city, UF) or None.
+        number = cep_number(cep)
+        if number is None or not self.available:
+            return None
+        place = self.cache.get(number)
+        if place is None:
+            place = self.index.lookup_number(number) or _NOT_FOUND
+            self.cache.set(number, place)
+        return place or None
+
+    def lookup_many(self, ceps):
+        numbers = [cep_number(cep) for cep in ceps]
+        if not self.available:
+            return [None] * len(numbers)
+        valid = sorted({n for n in numbers if n is not None})
+        places = dict(zip(valid, self.index.lookup_numbers(valid)))
+        return [places.get(n) for n in numbers]
+
+
+cep_service = CepService()
+
+# === Address Checks ===
+
+def address_error(place, city, state):
+    if place is None:
+        return "CEP não encontrado."
+    expected_city, expected_state = place
+    if state.upper() != expected_state:
+        return f"UF não corresponde ao CEP (esperado {expected_state})."
+    if fold(city) != fold(expected_city):
+        return f"Cidade não corresponde ao CEP (esperado {expected_city})."
+    return None
+
+
+def check_address(cep, city, state):
+    if not cep_service.available:
+        return None
+    return address_error(cep_service.lookup(cep), city, state)
+
+
+def check_addresses(rows):
+    # rows are (cep, city, state) tuples; returns an error or None per row.
+    rows = list(rows)
+    if not cep_service.available:
+        return [None] * len(rows)
+    places = cep_service.lookup_many(cep for cep, _, _ in rows)
+    return [address_error(place, city, state) for place, (_, city, state) in zip(places, rows)]
+
+# === Index Builder ===
+
+_COLUMN_ALIASES = {
+    "start": ("cep_inicial", "cep_inicio", "faixa_inicial", "start", "cep"),
+    "end": ("cep_final", "cep_fim", "faixa_final", "end"),
+    "city": ("cidade", "localidade", "municipio", "city"),
+    "state": ("uf", "estado", "state"),
+}
+
+
+def _read_source(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    reader = csv.DictReader(text, dialect=dialect)
+    headers = {name.strip().lower(): name for name in reader.fieldnames or []}
+    columns = {}
+    for key, aliases in _COLUMN_ALIASES.items():
+        columns[key] = next((headers[a] for a in aliases if a in headers), None)
+    if not (columns["start"] and columns["city"] and columns["state"]):
+        raise ValueError(f"source needs CEP, city and UF columns, got {reader.fieldnames}")
+    for row in reader:
+        start = cep_number(row[columns["start"]])
+        # A table without an end column lists single CEPs.
+        end = cep_number(row[columns["end"]]) if columns["end"] else start
+        if start is None or end is None or end < start:
+            continue
+        yield start, end, row[columns["city"]].strip(), row[columns["state"]].strip().upper()
+
+
+def build_index(source_path, output_path=CEP_INDEX_PATH):
+    places, place_ids, ranges = [], {}, []
+    with open(source_path, "rb") as f:
+        for start, end, city, state in _read_source(f):
+            key = (city, state)
+            if key not in place_ids:
+                place_ids[key] = len(places)
+                places.append(key)
+            ranges.append((start, end, place_ids[key]))
+    ranges.sort()
+    kept, skipped = [], 0
+    for start, end, place in ranges:
+        if kept and start <= kept[-1][1]:
+            skipped += 1
+            continue
+        kept.append((start, end, place))
+    places_blob = "\n".join(f"{city}\t{state}" for city, state in places).encode("utf-8")
+    places_offset = HEADER.size + len(kept) * RANGE.size
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, len(kept), len(places), places_offset))
+        for entry in kept:
+            out.write(RANGE.pack(*entry))
+        out.write(places_blob)
+    os.replace(tmp_path, output_path)
+    return len(kept), len(places), skipped
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "build":
+        print("usage: python -m utils.cep build <source.csv> [output]")
+        sys.exit(2)
+    output = sys.argv[3] if len(sys.argv) > 3 else CEP_INDEX_PATH
+    count, place_count, skipped = build_index(sys.argv[2], output)
+    print(f"[CEP] Wrote {count} ranges for {place_count} places to {output} ({skipped} overlapping skipped)")
+    sys.exit(0)
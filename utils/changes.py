@@ -0,0 +1,133 @@
+import asyncio
+import os
+import threading
+from pymongo.errors import OperationFailure, PyMongoError
+from utils.db import get_companies_collection
+
+# === Load environment variables ===
+COMPANY_CHANGE_STREAM = os.getenv("COMPANY_CHANGE_STREAM", "1") == "1"
+CHANGE_FEED_DEBOUNCE = float(os.getenv("CHANGE_FEED_DEBOUNCE", "0.2"))
+CHANGE_FEED_RETRY_SECONDS = 5
+
+# Raised by standalone servers, which have no oplog to watch.
+CHANGE_STREAM_UNSUPPORTED = 40573
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+def change_to_event(change):
+    op = change["operationType"]
+    if op == "replace":
+        op = "update"
+    return {
+        "op": op,
+        "_id": str(change["documentKey"]["_id"]),
+        "document": change.get("fullDocument"),
+    }
+
+
+def coalesce(previous, event):
+    # Collapse several changes to the same document into the one that matters.
+    if previous is None:
+        return event
+    if previous["op"] == "insert":
+        if event["op"] == "delete":
+            return None
+        return dict(event, op="insert")
+    return event
+
+
+class ChangeFeed:
+    # One watcher thread per process; events are coalesced per document and
+    # fanned out to subscribers on the event loop after a short debounce.
+    def __init__(self, collection_getter, debounce=CHANGE_FEED_DEBOUNCE):
+        self._collection_getter = collection_getter
+        self.debounce = debounce
+        self._subscribers = set()
+        self._pending = {}
+        self._flush_handle = None
+        self._loop = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._resume_token = None
+        self.running = False
+
+    def subscribe(self, callback):
+        self._subscribers.add(callback)
+        return lambda: self._subscribers.discard(callback)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self._collection_getter().watch(
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                    max_await_time_ms=1000,
+                ) as stream:
+                    self.running = True
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self._resume_token = stream.resume_token
+                        self._loop.call_soon_threadsafe(self.publish, change_to_event(change))
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    print("[DB] Change streams need a replica set; live sync disabled.")
+                    break
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # The token fell out of the oplog; resuming can never succeed, so start fresh.
+                    self._resume_token = None
+                print(f"[DB] Change stream failed: {e}")
+            except PyMongoError as e:
+                print(f"[DB] Change stream failed: {e}")
+            self.running = False
+            self._stop.wait(CHANGE_FEED_RETRY_SECONDS)
+        self.running = False
+
+    def publish(self, event):
+        # Must be called on the event loop thread.
+        key = event["_id"]
+        merged = coalesce(self._pending.pop(key, None), event)
+        if merged is not None:
+            self._pending[key] = merged
+        if self._flush_handle is None:
+            loop = self._loop or asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.debounce, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        events = list(self._pending.values())
+        self._pending.clear()
+        if not events:
+            return
+        for callback in list(self._subscribers):
+            try:
+                result = callback(events)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                print(f"[DB] Change feed subscriber failed: {e}")
+
+
+company_feed = ChangeFeed(get_companies_collection)
+
+
+async def start_company_feed():
+    if COMPANY_CHANGE_STREAM:
+        await company_feed.start()
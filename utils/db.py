@@ -0,0 +1,127 @@
+import os
+import threading
+from pymongo import MongoClient, monitoring
+from utils.metrics import command_listener
+
+# === Load environment variables ===
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_USERS_DB = os.getenv("MONGODB_USERS_DB", "ats_db")
+MONGO_USERS_COLLECTION = os.getenv("MONGODB_USERS_COLLECTION", "users")
+MONGO_DB = os.getenv("MONGODB_DB", "report_generator")
+MONGO_COLLECTION = os.getenv("MONGODB_COMPANIES_COLLECTION", "companies")
+
+# === Pool tuning ===
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    # Counters are updated from pymongo's background threads.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "created": 0,
+            "closed": 0,
+            "checked_out": 0,
+            "checked_in": 0,
+            "checkout_failed": 0,
+            "pool_cleared": 0,
+        }
+
+    def _incr(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["open"] = stats["created"] - stats["closed"]
+        stats["in_use"] = stats["checked_out"] - stats["checked_in"]
+        return stats
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incr("pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._incr("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incr("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incr("checkout_failed")
+
+    def connection_checked_out(self, event):
+        self._incr("checked_out")
+
+    def connection_checked_in(self, event):
+        self._incr("checked_in")
+
+
+pool_stats_listener = PoolStatsListener()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not MONGO_URI:
+                    raise RuntimeError("MONGO_URI environment variable not set")
+                _client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    event_listeners=[pool_stats_listener, command_listener],
+                )
+    return _client
+
+
+def get_users_collection():
+    return get_client()[MONGO_USERS_DB][MONGO_USERS_COLLECTION]
+
+
+def get_companies_collection():
+    return get_client()[MONGO_DB][MONGO_COLLECTION]
+
+
+def ping():
+    get_client().admin.command('ping')
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def pool_stats():
+    stats = pool_stats_listener.snapshot()
+    stats["max_pool_size"] = MONGO_MAX_POOL_SIZE
+    stats["min_pool_size"] = MONGO_MIN_POOL_SIZE
+    stats["connected"] = _client is not None
+    return stats
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import os
+import zlib
+from utils.db import get_companies_collection
+from utils.repository import COMPANY_PROJECTION, company_filter
+
+# === Load environment variables ===
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FIELDS = list(COMPANY_PROJECTION)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def export_query(q=None, state=None, city=None):
+    query = company_filter(q)
+    if state:
+        query["company_address_state"] = state.upper()
+    if city:
+        query["company_address_city"] = city
+    return query
+
+
+def iter_companies(query):
+    # The cursor fetches EXPORT_BATCH_SIZE documents at a time; nothing else is buffered.
+    cursor = get_companies_collection().find(query, COMPANY_PROJECTION).batch_size(EXPORT_BATCH_SIZE)
+    try:
+        for company in cursor:
+            company["_id"] = str(company["_id"])
+            yield company
+    finally:
+        cursor.close()
+
+
+def _chunked(lines):
+    buffer = io.StringIO()
+    for line in lines:
+        buffer.write(line)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer = io.StringIO()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _csv_lines(companies):
+    line = io.StringIO()
+    writer = csv.writer(line)
+
+    def render(values):
+        line.seek(0)
+        line.truncate()
+        writer.writerow(values)
+        return line.getvalue()
+
+    yield render(EXPORT_FIELDS)
+    for company in companies:
+        yield render([company.get(field, "") for field in EXPORT_FIELDS])
+
+
+def _ndjson_lines(companies):
+    for company in companies:
+        yield json.dumps(company, ensure_ascii=False, default=str) + "\n"
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_companies(query, fmt="csv", compress=False):
+    lines = _csv_lines if fmt == "csv" else _ndjson_lines
+    chunks = _chunked(lines(iter_companies(query)))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import time
+from utils.startup import startup
+
+# === Load environment variables ===
+HEALTH_PROBE_SECONDS = float(os.getenv("HEALTH_PROBE_SECONDS", "5"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+# Consecutive failed probes before a critical check makes the worker unready.
+HEALTH_FAILURE_THRESHOLD = int(os.getenv("HEALTH_FAILURE_THRESHOLD", "2"))
+
+
+class HealthProber:
+    # Checks run on a timer in the background; /healthz and /readyz only read
+    # the cached results, so polling them never touches Mongo.
+    def __init__(self, interval=HEALTH_PROBE_SECONDS, timeout=HEALTH_PROBE_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.checks = {}
+        self.results = {}
+        self.last_run = None
+
+    def add_check(self, name, fn, critical=True):
+        # fn is an async callable returning (ok, details).
+        self.checks[name] = (fn, critical)
+
+    async def _probe(self, name, fn, critical):
+        previous = self.results.get(name, {})
+        started = time.perf_counter()
+        try:
+            ok, details = await asyncio.wait_for(fn(), self.timeout)
+            error = None
+        except Exception as e:
+            ok, details, error = False, None, str(e) or type(e).__name__
+        failures = 0 if ok else previous.get("consecutive_failures", 0) + 1
+        self.results[name] = {
+            "ok": ok,
+            "critical": critical,
+            "details": details,
+            "error": error,
+            "consecutive_failures": failures,
+            "last_ok": time.time() if ok else previous.get("last_ok"),
+            "probe_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if failures == HEALTH_FAILURE_THRESHOLD:
+            print(f"[HEALTH] {name} check failing: {error or details}")
+
+    async def probe_once(self):
+        await asyncio.gather(*(
+            self._probe(name, fn, critical) for name, (fn, critical) in self.checks.items()
+        ))
+        self.last_run = time.time()
+
+    async def run(self):
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.interval)
+
+    @property
+    def stale(self):
+        # Results that stop updating mean the loop or the prober is stuck.
+        return self.last_run is None or time.time() - self.last_run > 3 * self.interval + self.timeout
+
+    @property
+    def ready(self):
+        if not startup.ready or self.last_run is None:
+            return False
+        return all(
+            result["consecutive_failures"] < HEALTH_FAILURE_THRESHOLD
+            for result in self.results.values() if result["critical"]
+        )
+
+    def liveness(self):
+        return {
+            "alive": self.last_run is None or not self.stale,
+            "last_probe_age_seconds": round(time.time() - self.last_run, 1) if self.last_run else None,
+        }
+
+    def readiness(self):
+        return {
+            "ready": self.ready,
+            "startup": startup.status(),
+            "checks": self.results,
+        }
+
+
+prober = HealthProber()
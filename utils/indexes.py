@@ -0,0 +1,129 @@
+import sys
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from utils.db import get_users_collection, get_companies_collection
+from utils.repository import COMPANY_SORT_FIELDS
+from utils.search import search_query
+
+# === Index Declarations ===
+# Unique indexes are kept apart from the rest: legacy duplicates can block them,
+# and that must not also cost the sort and search indexes.
+USER_UNIQUE_INDEXES = [
+    IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+]
+USER_INDEXES = []
+
+COMPANY_UNIQUE_INDEXES = [
+    IndexModel([("company_CNPJ", ASCENDING)], unique=True, name="company_CNPJ_unique"),
+]
+COMPANY_INDEXES = [
+    # Compound with _id so the paginated table sort never needs an in-memory SORT.
+    IndexModel([(field, ASCENDING), ("_id", ASCENDING)], name=f"{field}_sort")
+    for field in sorted(COMPANY_SORT_FIELDS)
+] + [
+    # Anchored prefix regexes on the normalized search fields stay index-bounded.
+    IndexModel([("search_tokens", ASCENDING)], name="search_tokens"),
+    IndexModel([("search_cnpj", ASCENDING)], name="search_cnpj"),
+]
+
+
+class IndexBuildError(Exception):
+    pass
+
+
+def declared_indexes():
+    return [
+        (get_users_collection(), USER_UNIQUE_INDEXES, USER_INDEXES),
+        (get_companies_collection(), COMPANY_UNIQUE_INDEXES, COMPANY_INDEXES),
+    ]
+
+
+def find_duplicates(collection, field, limit=20):
+    # The values that would make a unique index on `field` fail, most repeated first.
+    pipeline = [
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+    return [(doc["_id"], doc["count"]) for doc in collection.aggregate(pipeline, allowDiskUse=True)]
+
+
+def ensure_indexes():
+    # create_indexes is a no-op for indexes that already exist with the same spec.
+    # Raises IndexBuildError after building everything it can, so the startup
+    # step shows the failure in /internal/startup.
+    created, problems = {}, []
+    for collection, unique_indexes, indexes in declared_indexes():
+        names = created.setdefault(collection.full_name, [])
+        if indexes:
+            try:
+                names += collection.create_indexes(indexes)
+            except OperationFailure as e:
+                problems.append(f"{collection.full_name}: {e}")
+        for index in unique_indexes:
+            field = next(iter(index.document["key"]))
+            duplicates = find_duplicates(collection, field)
+            if duplicates:
+                listed = ", ".join(f"{value!r} x{count}" for value, count in duplicates)
+                problems.append(f"{collection.full_name}.{field} has duplicates, "
+                                f"{index.document['name']} not built: {listed}")
+                continue
+            try:
+                names += collection.create_indexes([index])
+            except OperationFailure as e:
+                problems.append(f"{collection.full_name}: {e}")
+    for problem in problems:
+        print(f"[DB] Index creation failed on {problem}")
+    if problems:
+        raise IndexBuildError("; ".join(problems))
+    return created
+
+# === Query Plan Report ===
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return [stage for stage in stages if stage]
+
+
+def hot_queries():
+    users = get_users_collection()
+    companies = get_companies_collection()
+    queries = {
+        "users.find_one(email)": users.find({"email": ""}).limit(1),
+        "companies.find_one(company_CNPJ)": companies.find({"company_CNPJ": ""}).limit(1),
+        "companies.search(name)": companies.find(search_query("acme")).limit(20),
+        "companies.search(cnpj)": companies.find({"search_cnpj": {"$regex": "^1234"}}).limit(20),
+    }
+    for field in sorted(COMPANY_SORT_FIELDS):
+        queries[f"companies.page(sort={field})"] = (
+            companies.find({}).sort([(field, ASCENDING), ("_id", ASCENDING)]).limit(20)
+        )
+    return queries
+
+
+def explain_hot_queries():
+    report = {}
+    for name, cursor in hot_queries().items():
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(plan)
+        report[name] = {"stages": stages, "collscan": "COLLSCAN" in stages}
+    return report
+
+
+if __name__ == "__main__":
+    try:
+        for full_name, names in ensure_indexes().items():
+            print(f"[DB] {full_name}: {', '.join(names) or 'no indexes created'}")
+    except IndexBuildError:
+        print("[DB] Resolve the duplicates listed above (merge or delete them), then run this again.")
+    report = explain_hot_queries()
+    for name, result in report.items():
+        flag = "COLLSCAN" if result["collscan"] else "ok"
+        print(f"[{flag}] {name}: {' <- '.join(result['stages'])}")
+    sys.exit(1 if any(r["collscan"] for r in report.values()) else 0)
@@ -0,0 +1,202 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pymongo import monitoring
+
+# === Load environment variables ===
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Per-request DB accounting; run_db copies the context into executor threads
+# so the command listener can attribute each command to its request.
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency = defaultdict(Histogram)
+        self.request_count = defaultdict(int)
+        self.db_latency = defaultdict(Histogram)
+        self.db_failures = defaultdict(int)
+        self.loop_lag = 0.0
+        self.loop_lag_max = 0.0
+        self.gauges = {}
+
+    def observe_request(self, method, route, status, seconds):
+        with self._lock:
+            self.request_latency[(method, route)].observe(seconds)
+            self.request_count[(method, route, status)] += 1
+
+    def observe_command(self, command, seconds, failed=False):
+        with self._lock:
+            self.db_latency[command].observe(seconds)
+            if failed:
+                self.db_failures[command] += 1
+
+    def set_gauge(self, name, fn, help_text):
+        # fn is evaluated at scrape time.
+        self.gauges[name] = (fn, help_text)
+
+
+registry = Registry()
+
+# === Mongo Command Listener ===
+
+class CommandMetricsListener(monitoring.CommandListener):
+    def __init__(self):
+        self._started = {}
+
+    def started(self, event):
+        self._started[event.request_id] = time.perf_counter()
+
+    def _finish(self, event, failed):
+        started = self._started.pop(event.request_id, None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        registry.observe_command(event.command_name, seconds, failed)
+        stats = current_request.get()
+        if stats is not None:
+            stats["db_count"] += 1
+            stats["db_seconds"] += seconds
+            stats["db_commands"][event.command_name] += 1
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
+
+
+command_listener = CommandMetricsListener()
+
+# === HTTP Middleware ===
+
+_route_labels = {}
+
+
+def route_label(app, scope):
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    path = scope.get("path", "")
+    if path not in _route_labels:
+        from starlette.routing import Match
+        label = "unmatched"
+        for candidate in app.router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                label = getattr(candidate, "path", path)
+                break
+        # Bounded: unknown paths all collapse into "unmatched" once the map is full.
+        if len(_route_labels) < 1000:
+            _route_labels[path] = label
+        return label
+    return _route_labels[path]
+
+
+def install(app):
+    @app.middleware("http")
+    async def record_request(request, call_next):
+        stats = {"db_count": 0, "db_seconds": 0.0, "db_commands": defaultdict(int)}
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            seconds = time.perf_counter() - started
+            current_request.reset(token)
+            route = route_label(app, request.scope)
+            registry.observe_request(request.method, route, status, seconds)
+            if seconds * 1000 >= SLOW_REQUEST_MS:
+                commands = ", ".join(f"{name}={n}" for name, n in sorted(stats["db_commands"].items()))
+                print(
+                    f"[SLOW] {request.method} {request.url.path} ({route}) {status} "
+                    f"{seconds * 1000:.0f}ms; db {stats['db_count']} cmds "
+                    f"{stats['db_seconds'] * 1000:.0f}ms [{commands}]"
+                )
+
+# === Event Loop Lag ===
+
+async def measure_loop_lag():
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.perf_counter() - started - LOOP_LAG_INTERVAL)
+        registry.loop_lag = lag
+        registry.loop_lag_max = max(registry.loop_lag_max, lag)
+
+# === Exposition ===
+
+def _labels(**labels):
+    inner = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items())
+    return "{" + inner + "}" if inner else ""
+
+
+def _histogram_lines(name, histogram, **labels):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.total}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def render_metrics():
+    lines = []
+    with registry._lock:
+        lines += ["# HELP ats_http_request_seconds Request latency by route.",
+                  "# TYPE ats_http_request_seconds histogram"]
+        for (method, route), histogram in sorted(registry.request_latency.items()):
+            lines += _histogram_lines("ats_http_request_seconds", histogram, method=method, route=route)
+        lines += ["# HELP ats_http_requests_total Requests by route and status.",
+                  "# TYPE ats_http_requests_total counter"]
+        for (method, route, status), count in sorted(registry.request_count.items()):
+            lines.append(f"ats_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines += ["# HELP ats_mongo_command_seconds Mongo command latency by command.",
+                  "# TYPE ats_mongo_command_seconds histogram"]
+        for command, histogram in sorted(registry.db_latency.items()):
+            lines += _histogram_lines("ats_mongo_command_seconds", histogram, command=command)
+        lines += ["# HELP ats_mongo_command_failures_total Failed Mongo commands.",
+                  "# TYPE ats_mongo_command_failures_total counter"]
+        for command, count in sorted(registry.db_failures.items()):
+            lines.append(f"ats_mongo_command_failures_total{_labels(command=command)} {count}")
+    lines += ["# HELP ats_event_loop_lag_seconds Last measured event loop lag.",
+              "# TYPE ats_event_loop_lag_seconds gauge",
+              f"ats_event_loop_lag_seconds {registry.loop_lag}",
+              "# HELP ats_event_loop_lag_max_seconds Worst event loop lag since start.",
+              "# TYPE ats_event_loop_lag_max_seconds gauge",
+              f"ats_event_loop_lag_max_seconds {registry.loop_lag_max}"]
+    for name, (fn, help_text) in sorted(registry.gauges.items()):
+        try:
+            value = fn()
+        except Exception:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import time
+
+# === Load environment variables ===
+GOOGLE_METADATA_URL = os.getenv(
+    "OAUTH_SERVER_METADATA_URL", "https://accounts.google.com/.well-known/openid-configuration"
+)
+# A fixed metadata+JWKS bundle (same shape as the disk cache) replaces the
+# provider entirely, e.g. to run against a local stub without network access.
+OAUTH_METADATA_FILE = os.getenv("OAUTH_METADATA_FILE")
+OAUTH_METADATA_CACHE_DIR = os.getenv("OAUTH_METADATA_CACHE_DIR", ".oauth_cache")
+OAUTH_METADATA_TTL = int(os.getenv("OAUTH_METADATA_TTL", str(24 * 3600)))
+OAUTH_METADATA_TIMEOUT = float(os.getenv("OAUTH_METADATA_TIMEOUT", "5"))
+# Retry interval while nothing at all is loaded (e.g. a network blip at boot).
+OAUTH_METADATA_RETRY_SECONDS = float(os.getenv("OAUTH_METADATA_RETRY_SECONDS", "30"))
+
+
+class ProviderMetadata:
+    # Discovery document and JWKS for one provider, cached in memory and on
+    # disk and pushed into the Authlib client so logins never fetch them inline.
+    def __init__(self, name, url, fixed_file=None, cache_dir=OAUTH_METADATA_CACHE_DIR, ttl=OAUTH_METADATA_TTL):
+        self.name = name
+        self.url = url
+        self.fixed_file = fixed_file
+        self.cache_path = os.path.join(cache_dir, f"{name}.json")
+        self.ttl = ttl
+        self.bundle = None
+        self.last_error = None
+
+    @property
+    def age(self):
+        return time.time() - self.bundle["fetched_at"] if self.bundle else None
+
+    @property
+    def fresh(self):
+        return self.bundle is not None and (self.fixed_file or self.age < self.ttl)
+
+    def _read(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_fixed_file(self):
+        # A broken fixed file is a configuration error, not a provider outage:
+        # fail loudly and name the file rather than running without metadata.
+        try:
+            with open(self.fixed_file, encoding="utf-8") as f:
+                bundle = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"OAUTH_METADATA_FILE {self.fixed_file} could not be read: {e}")
+        if not isinstance(bundle, dict) or not {"metadata", "jwks"} <= bundle.keys():
+            raise ValueError(f"OAUTH_METADATA_FILE {self.fixed_file} needs \"metadata\" and \"jwks\" entries")
+        bundle.setdefault("fetched_at", time.time())
+        return bundle
+
+    def _write_cache(self, bundle):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(bundle, f)
+        os.replace(tmp_path, self.cache_path)
+
+    async def fetch(self):
+        # Imported here so importing this module (and utils.auth) stays cheap.
+        import httpx
+        async with httpx.AsyncClient(timeout=OAUTH_METADATA_TIMEOUT) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            metadata = response.json()
+            response = await client.get(metadata["jwks_uri"])
+            response.raise_for_status()
+            jwks = response.json()
+        return {"metadata": metadata, "jwks": jwks, "fetched_at": time.time()}
+
+    async def load(self, client=None):
+        if self.fixed_file:
+            self.bundle = self._read_fixed_file()
+        else:
+            cached = self._read(self.cache_path)
+            if cached and time.time() - cached.get("fetched_at", 0) < self.ttl:
+                self.bundle = cached
+            else:
+                await self.refresh()
+                if self.bundle is None and cached:
+                    # Stale is better than nothing; the background refresh keeps trying.
+                    self.bundle = cached
+        if client is not None:
+            self.install(client)
+
+    async def refresh(self, client=None):
+        try:
+            bundle = await self.fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"[AUTH] Could not refresh {self.name} provider metadata: {e}")
+            return False
+        self.bundle = bundle
+        self.last_error = None
+        await asyncio.get_running_loop().run_in_executor(None, self._write_cache, bundle)
+        if client is not None:
+            self.install(client)
+        return True
+
+    def install(self, client):
+        if not self.bundle:
+            return
+        # Authlib skips discovery when "_loaded_at" is set and reuses "jwks"
+        # until a token arrives with an unknown key id.
+        client.server_metadata.update(self.bundle["metadata"])
+        client.server_metadata["jwks"] = self.bundle["jwks"]
+        client.server_metadata["_loaded_at"] = self.bundle["fetched_at"]
+
+    async def keep_fresh(self, client):
+        await self.load(client)
+        if self.fixed_file:
+            return
+        while True:
+            if self.bundle is None:
+                # Readiness depends on this, so don't wait out the TTL schedule.
+                await asyncio.sleep(OAUTH_METADATA_RETRY_SECONDS)
+            else:
+                await asyncio.sleep(max(60, self.ttl / 2 - self.age))
+            await self.refresh(client)
+
+    def status(self):
+        return {
+            "source": self.fixed_file or self.url,
+            "loaded": self.bundle is not None,
+            "age_seconds": round(self.age) if self.bundle else None,
+            "fresh": bool(self.fresh),
+            "last_error": self.last_error,
+        }
+
+
+google_metadata = ProviderMetadata("google", GOOGLE_METADATA_URL, fixed_file=OAUTH_METADATA_FILE)
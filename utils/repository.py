@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils.db import get_users_collection, get_companies_collection
+from utils.search import search_fields, search_query
+from utils.validation import format_cnpj, validate_cnpj
+from utils.versions import ALL_USERS, bump, company_version_keys
+
+# === Executor Setup ===
+# pymongo is blocking, so every call is offloaded to a bounded thread pool
+# sized a little below the Mongo connection pool.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+COMPANY_PROJECTION = {
+    "_id": 1,
+    "company_name": 1,
+    "company_CNPJ": 1,
+    "company_address_CEP": 1,
+    "company_address_number": 1,
+    "company_address_additional": 1,
+    "company_address_city": 1,
+    "company_address_state": 1,
+}
+
+COMPANY_DETAIL_PROJECTION = dict(COMPANY_PROJECTION, version=1)
+
+COMPANY_SORT_FIELDS = set(COMPANY_PROJECTION) - {"_id"}
+COMPANY_PAGE_SIZE_LIMIT = 200
+COMPANY_SEARCH_MAX_TIME_MS = int(os.getenv("COMPANY_SEARCH_MAX_TIME_MS", "2000"))
+
+DUPLICATE_CNPJ = "Empresa com este CNPJ já existe."
+EDIT_CONFLICT = "A empresa foi alterada ou excluída por outro usuário. Reabra para editar."
+
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context into the worker thread so DB metrics are
+    # attributed to the request that issued them.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+# === Users ===
+
+def _find_user_by_email(email):
+    return get_users_collection().find_one({"email": email})
+
+
+def _upsert_user(userinfo):
+    # BSON stores milliseconds, so truncate to recognise our own $setOnInsert value.
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    query = {"email": userinfo["email"]}
+    update = {
+        "$set": {"name": userinfo["name"], "picture": userinfo.get("picture")},
+        "$setOnInsert": {"created": now},
+    }
+    collection = get_users_collection()
+    try:
+        user = collection.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+    except DuplicateKeyError:
+        # A concurrent login inserted first; the unique email index turned our insert
+        # into this error, and a plain retry now matches the existing document.
+        user = collection.find_one_and_update(query, update, return_document=ReturnDocument.AFTER)
+    if user.get("created") == now:
+        bump([ALL_USERS])
+    return user
+
+
+async def find_user_by_email(email):
+    return await run_db(_find_user_by_email, email)
+
+
+async def upsert_user(userinfo):
+    return await run_db(_upsert_user, userinfo)
+
+# === Companies ===
+
+def _get_all_companies():
+    return list(get_companies_collection().find({}, COMPANY_PROJECTION))
+
+
+def company_filter(text):
+    return search_query(text)
+
+
+def _find_companies_page(page, rows_per_page, sort_by=None, descending=False, filter_text=None):
+    collection = get_companies_collection()
+    query = company_filter(filter_text)
+    rows_per_page = max(1, min(int(rows_per_page or 1), COMPANY_PAGE_SIZE_LIMIT))
+    page = max(1, int(page or 1))
+    direction = DESCENDING if descending else ASCENDING
+    sort = [("_id", direction)]
+    if sort_by in COMPANY_SORT_FIELDS:
+        sort.insert(0, (sort_by, direction))
+    cursor = (
+        collection.find(query, COMPANY_PROJECTION)
+        .sort(sort)
+        .skip((page - 1) * rows_per_page)
+        .limit(rows_per_page)
+        .max_time_ms(COMPANY_SEARCH_MAX_TIME_MS)
+    )
+    rows = list(cursor)
+    # The unfiltered total comes from collection metadata instead of a scan.
+    total = (
+        collection.count_documents(query, maxTimeMS=COMPANY_SEARCH_MAX_TIME_MS)
+        if query else collection.estimated_document_count()
+    )
+    return rows, total
+
+
+def _version_filter(version):
+    # Documents created before versioning have no field; they count as version 0.
+    return {"$in": [0, None]} if not version else version
+
+
+def _get_company(company_id):
+    if not ObjectId.is_valid(company_id):
+        return None
+    company = get_companies_collection().find_one({"_id": ObjectId(company_id)}, COMPANY_DETAIL_PROJECTION)
+    if company is not None:
+        company.setdefault("version", 0)
+    return company
+
+
+def _normalize_company(data):
+    # Valid CNPJs are stored as 00.000.000/0000-00 whichever way they were typed;
+    # legacy values that predate check-digit validation are left as they are.
+    cnpj = data.get("company_CNPJ")
+    if cnpj and validate_cnpj(cnpj):
+        return dict(data, company_CNPJ=format_cnpj(cnpj))
+    return data
+
+
+def _add_company(data):
+    data = _normalize_company(data)
+    collection = get_companies_collection()
+    if collection.find_one({"company_CNPJ": data["company_CNPJ"]}):
+        return False, DUPLICATE_CNPJ, None
+    company = dict(data, version=0, **search_fields(data))
+    try:
+        result = collection.insert_one(company)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent insert; the unique CNPJ index caught it.
+        return False, DUPLICATE_CNPJ, None
+    bump(company_version_keys(company))
+    return True, f"Empresa adicionada com id {result.inserted_id}", company
+
+
+def _update_company(company_id, data, expected_version=None):
+    # Returns (updated company, None) or (None, reason shown to the user).
+    data = _normalize_company(data)
+    query = {"_id": ObjectId(company_id)}
+    if expected_version is not None:
+        query["version"] = _version_filter(expected_version)
+    collection = get_companies_collection()
+    changes = dict(data)
+    # Search fields are only rewritten for the keys being updated. The tokens
+    # need both name and city, so a missing one is read and pinned in the query:
+    # if it changes meanwhile the update misses and reports a conflict.
+    token_fields = {"company_name", "company_address_city"}
+    touched = token_fields & data.keys()
+    merged = data
+    if touched and touched != token_fields:
+        missing = (token_fields - touched).pop()
+        current = collection.find_one(query, {missing: 1})
+        if current is None:
+            return None, EDIT_CONFLICT
+        query[missing] = current.get(missing)
+        merged = dict(data, **{missing: current.get(missing)})
+    fields = search_fields(merged)
+    if touched:
+        changes["search_tokens"] = fields["search_tokens"]
+    if "company_CNPJ" in data:
+        changes["search_cnpj"] = fields["search_cnpj"]
+    # The previous document is needed to invalidate its old UF; the updated one
+    # is rebuilt from it so callers can patch their view without re-querying.
+    try:
+        before = collection.find_one_and_update(
+            query,
+            {"$set": changes, "$inc": {"version": 1}},
+            projection=COMPANY_DETAIL_PROJECTION,
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        return None, DUPLICATE_CNPJ
+    if before is None:
+        return None, EDIT_CONFLICT
+    after = dict(before, **data, version=before.get("version", 0) + 1)
+    bump(company_version_keys(before, after))
+    return after, None
+
+
+def _delete_company(company_id):
+    deleted = get_companies_collection().find_one_and_delete(
+        {"_id": ObjectId(company_id)},
+        projection={"company_address_state": 1},
+    )
+    if deleted is None:
+        return False
+    bump(company_version_keys(deleted))
+    return True
+
+
+async def get_all_companies():
+    return await run_db(_get_all_companies)
+
+
+async def get_company(company_id):
+    return await run_db(_get_company, company_id)
+
+
+async def find_companies_page(page, rows_per_page, sort_by=None, descending=False, filter_text=None):
+    return await run_db(_find_companies_page, page, rows_per_page, sort_by, descending, filter_text)
+
+
+async def add_company(data):
+    return await run_db(_add_company, data)
+
+
+async def update_company(company_id, data, expected_version=None):
+    return await run_db(_update_company, company_id, data, expected_version)
+
+
+async def delete_company(company_id):
+    return await run_db(_delete_company, company_id)
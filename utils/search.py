@@ -0,0 +1,64 @@
+import re
+import sys
+import unicodedata
+from pymongo import UpdateOne
+from utils.db import get_companies_collection
+
+# Normalized copies of the searchable fields are stored on each company so
+# every search is an anchored prefix match that an index can bound.
+SEARCH_FIELDS = ("search_tokens", "search_cnpj")
+
+_WORD = re.compile(r"\w+")
+_NON_DIGIT = re.compile(r"\D")
+
+
+def fold(text):
+    decomposed = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def digits(text):
+    return _NON_DIGIT.sub("", str(text or ""))
+
+
+def search_fields(company):
+    words = _WORD.findall(fold(company.get("company_name")) + " " + fold(company.get("company_address_city")))
+    return {
+        "search_tokens": sorted(set(words)),
+        "search_cnpj": digits(company.get("company_CNPJ")),
+    }
+
+
+def search_query(text):
+    words = _WORD.findall(fold(text))
+    if not words:
+        return {}
+    by_tokens = {"$and": [{"search_tokens": {"$regex": f"^{re.escape(w)}"}} for w in words]}
+    cnpj = digits(text)
+    # A purely numeric input may be a CNPJ fragment typed with or without punctuation.
+    if len(cnpj) >= 2 and cnpj == "".join(words):
+        return {"$or": [by_tokens, {"search_cnpj": {"$regex": f"^{cnpj}"}}]}
+    return by_tokens
+
+
+def backfill_search_fields(batch_size=1000):
+    collection = get_companies_collection()
+    cursor = collection.find(
+        {"search_tokens": {"$exists": False}},
+        {"company_name": 1, "company_CNPJ": 1, "company_address_city": 1},
+    ).batch_size(batch_size)
+    updated = 0
+    batch = []
+    for company in cursor:
+        batch.append(UpdateOne({"_id": company["_id"]}, {"$set": search_fields(company)}))
+        if len(batch) >= batch_size:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+if __name__ == "__main__":
+    print(f"[DB] Search fields backfilled on {backfill_search_fields()} companies")
+    sys.exit(0)
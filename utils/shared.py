@@ -0,0 +1,115 @@
+import asyncio
+import os
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from utils.db import get_client, MONGO_DB
+from utils.repository import run_db
+
+# === Load environment variables ===
+# "local" keeps everything in this process; "mongo" relays messages between
+# workers (and nodes) through a capped collection, which also works on a
+# standalone server.
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "local")
+SHARED_EVENTS_COLLECTION = os.getenv("MONGODB_SHARED_EVENTS_COLLECTION", "shared_events")
+SHARED_EVENTS_BYTES = int(os.getenv("SHARED_EVENTS_BYTES", str(4 * 1024 * 1024)))
+SHARED_RETRY_SECONDS = 5
+
+NODE_ID = uuid.uuid4().hex
+
+
+class LocalBus:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel, callback):
+        self._subscribers[channel].add(callback)
+        return lambda: self._subscribers[channel].discard(callback)
+
+    def publish(self, channel, payload):
+        # Local subscribers run synchronously so the caller sees the effect immediately.
+        self._dispatch(channel, payload)
+
+    def _dispatch(self, channel, payload):
+        for callback in list(self._subscribers.get(channel, ())):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"[SHARED] Subscriber on {channel} failed: {e}")
+
+    async def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class MongoBus(LocalBus):
+    def __init__(self):
+        super().__init__()
+        self._loop = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def get_collection(self):
+        return get_client()[MONGO_DB][SHARED_EVENTS_COLLECTION]
+
+    def publish(self, channel, payload):
+        super().publish(channel, payload)
+        asyncio.ensure_future(run_db(self._insert, channel, payload))
+
+    def _insert(self, channel, payload):
+        try:
+            self.get_collection().insert_one({
+                "channel": channel,
+                "payload": payload,
+                "node": NODE_ID,
+                "ts": datetime.utcnow(),
+            })
+        except PyMongoError as e:
+            print(f"[SHARED] Publish on {channel} failed: {e}")
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._tail, name="shared-bus", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _ensure_collection(self):
+        database = get_client()[MONGO_DB]
+        try:
+            database.create_collection(SHARED_EVENTS_COLLECTION, capped=True, size=SHARED_EVENTS_BYTES)
+        except CollectionInvalid:
+            pass
+        return database[SHARED_EVENTS_COLLECTION]
+
+    def _tail(self):
+        # The position is fixed once: everything published from now on. Until the
+        # first event arrives it is a start time, so a retry never skips events
+        # published while the cursor was down.
+        started = datetime.utcnow()
+        last_id = None
+        while not self._stop.is_set():
+            try:
+                collection = self._ensure_collection()
+                query = {"_id": {"$gt": last_id}} if last_id else {"ts": {"$gte": started}}
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=1000)
+                while cursor.alive and not self._stop.is_set():
+                    for event in cursor:
+                        last_id = event["_id"]
+                        if event.get("node") != NODE_ID:
+                            self._loop.call_soon_threadsafe(self._dispatch, event["channel"], event["payload"])
+            except PyMongoError as e:
+                print(f"[SHARED] Event tailing failed: {e}")
+            self._stop.wait(SHARED_RETRY_SECONDS)
+
+
+bus = MongoBus() if SHARED_STATE_BACKEND == "mongo" else LocalBus()
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+
+# === Load environment variables ===
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+
+PENDING = "pending"
+RUNNING = "running"
+OK = "ok"
+FAILED = "failed"
+
+
+class StartupSteps:
+    # Startup work runs in the background after the server has bound its
+    # port; each step records its state here so readiness can be reported
+    # instead of blocking (or killing) the worker.
+    def __init__(self):
+        self.started = time.time()
+        self.steps = {}
+        self._tasks = set()
+
+    def _record(self, name, status, error=None, required=True):
+        step = self.steps.setdefault(name, {"required": required, "attempts": 0})
+        step.update(status=status, error=error, at=time.time())
+        if status == RUNNING:
+            step["attempts"] += 1
+        elif status == OK:
+            step["seconds"] = round(step["at"] - self.started, 3)
+
+    async def run(self, name, fn, required=True, retry=False, after=()):
+        # fn is an async callable. Steps listed in `after` must succeed first.
+        self._record(name, PENDING, required=required)
+        for dependency in after:
+            await self.wait(dependency)
+        while True:
+            self._record(name, RUNNING, required=required)
+            try:
+                await fn()
+            except Exception as e:
+                print(f"[STARTUP] {name} failed: {e}")
+                self._record(name, FAILED, str(e), required)
+                if not retry:
+                    return False
+                await asyncio.sleep(STARTUP_RETRY_SECONDS)
+                continue
+            self._record(name, OK, required=required)
+            return True
+
+    def start(self, name, fn, required=True, retry=False, after=()):
+        # Registered before the task runs, so readiness is false from the start.
+        self._record(name, PENDING, required=required)
+        task = asyncio.ensure_future(self.run(name, fn, required, retry, after))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def wait(self, name):
+        while self.steps.get(name, {}).get("status") != OK:
+            await asyncio.sleep(0.1)
+
+    @property
+    def ready(self):
+        return all(step["status"] == OK for step in self.steps.values() if step["required"])
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "steps": self.steps,
+        }
+
+
+startup = StartupSteps()
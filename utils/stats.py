@@ -0,0 +1,166 @@
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from utils.db import get_client, get_companies_collection, get_users_collection, MONGO_DB
+from utils.repository import run_db
+from utils.versions import ALL_COMPANIES, ALL_USERS, company_state_key, get_versions, get_versions_collection
+
+# === Load environment variables ===
+STATS_REFRESH_SECONDS = int(os.getenv("STATS_REFRESH_SECONDS", "60"))
+STATS_RECENT_DAYS = int(os.getenv("STATS_RECENT_DAYS", "30"))
+
+SUMMARY_COLLECTION = "dashboard_summary"
+SUMMARY_SLICES_COLLECTION = "dashboard_summary_slices"
+STATE_KEY_PREFIX = company_state_key("")
+CITY_RANKING_SIZE = 20
+
+# === Pipelines ===
+# All counting happens inside Mongo; Python only stores the (small) results.
+
+def state_slices_pipeline(states=None):
+    # (UF, city) counts for the given UFs only, or for every UF on a full rebuild.
+    match = [] if states is None else [{"$match": {"company_address_state": {"$in": states}}}]
+    return match + [
+        {"$group": {
+            "_id": {"state": "$company_address_state", "city": "$company_address_city"},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+
+def recent_companies_pipeline():
+    # _id embeds the insertion time, so the range match is served by the _id index.
+    since = datetime.utcnow() - timedelta(days=STATS_RECENT_DAYS)
+    return [
+        {"$match": {"_id": {"$gte": ObjectId.from_datetime(since)}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$_id"}}},
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def users_by_month_pipeline():
+    return [
+        {"$match": {"created": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m", "date": "$created"}},
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+# name -> (collection getter, pipeline, version keys it depends on, max age)
+# The per-UF and per-city sections are not listed here: they are assembled
+# from state slices, see refresh_state_slices.
+SECTIONS = {
+    # Also time-dependent: the window moves even when no company changes.
+    "recent_companies": (get_companies_collection, recent_companies_pipeline, [ALL_COMPANIES], timedelta(hours=1)),
+    "users_by_month": (get_users_collection, users_by_month_pipeline, [ALL_USERS], None),
+}
+
+# === Materialized Summary ===
+
+def get_summary_collection():
+    return get_client()[MONGO_DB][SUMMARY_COLLECTION]
+
+
+def get_slices_collection():
+    return get_client()[MONGO_DB][SUMMARY_SLICES_COLLECTION]
+
+
+def _state_versions():
+    docs = get_versions_collection().find({"_id": {"$regex": f"^{STATE_KEY_PREFIX}"}})
+    return {doc["_id"][len(STATE_KEY_PREFIX):]: doc["v"] for doc in docs}
+
+
+def refresh_state_slices(force=False):
+    # One document per UF with its city counts and the UF's data version. Writes
+    # bump only the UF keys they touch, so only those UFs are re-aggregated;
+    # the whole collection is only scanned on the first run (or when forced).
+    slices = get_slices_collection()
+    versions = _state_versions()
+    stored = {doc["_id"]: doc.get("version") for doc in slices.find({}, {"version": 1})}
+    if force or not stored:
+        changed = None
+    else:
+        changed = [state for state, version in versions.items() if stored.get(state) != version]
+        if not changed:
+            return False
+    values = None
+    if changed is not None:
+        values = [v for state in changed for v in ((state, state.lower()) if state else ("", None))]
+    counts = defaultdict(dict)
+    for doc in get_companies_collection().aggregate(state_slices_pipeline(values)):
+        state = (doc["_id"].get("state") or "").upper()
+        city = doc["_id"].get("city") or ""
+        counts[state][city] = counts[state].get(city, 0) + doc["count"]
+    targets = set(changed) if changed is not None else set(counts) | set(stored) | set(versions)
+    for state in targets:
+        cities = counts.get(state, {})
+        # Empty UFs are kept with a zero count so their version is remembered.
+        slices.replace_one({"_id": state}, {
+            "version": versions.get(state, 0),
+            "count": sum(cities.values()),
+            "cities": [{"city": city, "count": count} for city, count in cities.items()],
+        }, upsert=True)
+    return True
+
+
+def _slice_sections():
+    by_state, by_city = [], []
+    for doc in get_slices_collection().find({"count": {"$gt": 0}}):
+        by_state.append({"_id": doc["_id"], "count": doc["count"]})
+        by_city += [dict(city, state=doc["_id"]) for city in doc["cities"]]
+    by_state.sort(key=lambda s: (-s["count"], s["_id"]))
+    by_city.sort(key=lambda c: -c["count"])
+    return {"companies_by_state": by_state, "companies_by_city": by_city[:CITY_RANKING_SIZE]}
+
+
+def _is_current(doc, versions, max_age, now):
+    if doc is None or doc.get("versions") != versions:
+        return False
+    return max_age is None or now - doc["refreshed"] < max_age
+
+
+def refresh_summary(force=False):
+    # Only sections whose source data changed (or aged out) are recomputed.
+    summary = get_summary_collection()
+    keys = {key for _, _, deps, _ in SECTIONS.values() for key in deps}
+    versions = get_versions(keys)
+    existing = {doc["_id"]: doc for doc in summary.find({}, {"versions": 1, "refreshed": 1})}
+    now = datetime.utcnow()
+    refreshed = []
+    for name, (collection_getter, pipeline, deps, max_age) in SECTIONS.items():
+        current = {key: versions[key] for key in deps}
+        if not force and _is_current(existing.get(name), current, max_age, now):
+            continue
+        data = list(collection_getter().aggregate(pipeline()))
+        summary.replace_one(
+            {"_id": name},
+            {"data": data, "versions": current, "refreshed": now},
+            upsert=True,
+        )
+        refreshed.append(name)
+    if refresh_state_slices(force) or not {"companies_by_state", "companies_by_city"} <= existing.keys():
+        for name, data in _slice_sections().items():
+            summary.replace_one({"_id": name}, {"data": data, "versions": {}, "refreshed": now}, upsert=True)
+            refreshed.append(name)
+    return refreshed
+
+
+def load_summary():
+    return {doc["_id"]: doc for doc in get_summary_collection().find()}
+
+
+async def summary_refresher():
+    while True:
+        try:
+            await run_db(refresh_summary)
+        except Exception as e:
+            print(f"[DB] Dashboard summary refresh failed: {e}")
+        await asyncio.sleep(STATS_REFRESH_SECONDS)
@@ -0,0 +1,88 @@
+import re
+from operator import mul
+
+try:
+    import numpy as np
+except ImportError:  # optional: batches fall back to a plain loop
+    np = None
+
+# ASCII only: other Unicode digits would break the digit arithmetic.
+_CNPJ = re.compile(r"\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}|\d{14}", re.ASCII)
+_NON_DIGIT = re.compile(r"\D")
+_PUNCTUATION = str.maketrans("", "", "./-")
+_CEP = re.compile(r"\d{5}-\d{3}", re.ASCII)
+_STATE = re.compile(r"[A-Za-z]{2}", re.ASCII)
+
+CNPJ_WEIGHTS = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# === CNPJ ===
+# Accepted as 00.000.000/0000-00 or as 14 bare digits. The last two digits
+# are mod-11 check digits over the first 12 and 13 digits.
+
+def _check_digit(numbers, weights):
+    remainder = sum(map(mul, numbers, weights)) % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def cnpj_check_digits(base):
+    # The first digit is weighted 5..2,9..2 over 12 digits, the second 6..2,9..2 over 13.
+    numbers = [ord(c) - 48 for c in base[:12]]
+    first = _check_digit(numbers, CNPJ_WEIGHTS[1:])
+    numbers.append(first)
+    return f"{first}{_check_digit(numbers, CNPJ_WEIGHTS)}"
+
+
+def format_cnpj(cnpj):
+    d = _NON_DIGIT.sub("", cnpj)
+    return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:]}"
+
+
+def validate_cnpj(cnpj):
+    if not _CNPJ.fullmatch(cnpj):
+        return False
+    d = cnpj.translate(_PUNCTUATION)
+    # Repeated digits pass the checksum but are never issued.
+    if d == d[0] * 14:
+        return False
+    return cnpj_check_digits(d) == d[12:]
+
+
+def validate_cnpjs(values):
+    # Whole-column check for bulk imports: one vectorized pass over a
+    # (rows, 14) digit matrix instead of one Python call per row.
+    values = list(values)
+    if np is None:
+        return [validate_cnpj(v) for v in values]
+    fullmatch = _CNPJ.fullmatch
+    valid = [False] * len(values)
+    indexes = [i for i, v in enumerate(values) if fullmatch(v)]
+    if not indexes:
+        return valid
+    raw = "".join([values[i] for i in indexes]).translate(_PUNCTUATION).encode("ascii")
+    digits = (np.frombuffer(raw, dtype=np.uint8).reshape(-1, 14) - 48).astype(np.int32)
+    weights = np.array(CNPJ_WEIGHTS, dtype=np.int32)
+    first = digits[:, :12] @ weights[1:] % 11
+    first = np.where(first < 2, 0, 11 - first)
+    second = (digits[:, :12] @ weights[:12] + first * weights[12]) % 11
+    second = np.where(second < 2, 0, 11 - second)
+    ok = (first == digits[:, 12]) & (second == digits[:, 13]) & ~(digits == digits[:, :1]).all(axis=1)
+    for i, result in zip(indexes, ok.tolist()):
+        valid[i] = result
+    return valid
+
+# === Address ===
+
+def validate_cep(cep):
+    return bool(_CEP.fullmatch(cep))
+
+
+def validate_ceps(values):
+    return [bool(_CEP.fullmatch(v)) for v in values]
+
+
+def validate_state(state):
+    return bool(_STATE.fullmatch(state))
+
+
+def validate_states(values):
+    return [bool(_STATE.fullmatch(v)) for v in values]
@@ -0,0 +1,40 @@
+from pymongo import UpdateOne
+from utils.db import get_client, MONGO_DB
+
+# Monotonic counters per slice of data; derived caches key on them so a write
+# only invalidates entries that read the slice it touched.
+DATA_VERSIONS_COLLECTION = "data_versions"
+ALL_COMPANIES = "companies:all"
+ALL_USERS = "users:all"
+
+
+def get_versions_collection():
+    return get_client()[MONGO_DB][DATA_VERSIONS_COLLECTION]
+
+
+def company_state_key(state):
+    return f"companies:state:{(state or '').upper()}"
+
+
+def company_version_keys(*companies):
+    keys = {ALL_COMPANIES}
+    for company in companies:
+        # Companies without a UF get the "" key, so every write touches some UF slice.
+        if company:
+            keys.add(company_state_key(company.get("company_address_state")))
+    return sorted(keys)
+
+
+def bump(keys):
+    if keys:
+        get_versions_collection().bulk_write(
+            [UpdateOne({"_id": key}, {"$inc": {"v": 1}}, upsert=True) for key in keys],
+            ordered=False,
+        )
+
+
+def get_versions(keys):
+    versions = {key: 0 for key in keys}
+    for doc in get_versions_collection().find({"_id": {"$in": list(keys)}}):
+        versions[doc["_id"]] = doc["v"]
+    return versions